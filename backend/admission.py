@@ -0,0 +1,186 @@
+from contextlib import asynccontextmanager
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from fastapi import HTTPException
+import asyncio
+import math
+import os
+import threading
+import time
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_SHED, ADMISSION_WAITING
+from serving import WORKERS, per_worker
+
+# Token buckets for the report endpoints: rate in requests per minute, burst in
+# requests. "memory" buckets are per process, so several workers share theirs in Mongo
+ADMISSION_BACKEND = os.getenv("ADMISSION_BACKEND", "mongo" if WORKERS > 1 else "memory")
+REPORT_USER_RATE = float(os.getenv("REPORT_USER_RATE", 10))
+REPORT_USER_BURST = float(os.getenv("REPORT_USER_BURST", 5))
+REPORT_GLOBAL_RATE = float(os.getenv("REPORT_GLOBAL_RATE", 600))
+REPORT_GLOBAL_BURST = float(os.getenv("REPORT_GLOBAL_BURST", 60))
+
+# Report requests served at once, and how many may wait and for how long; the
+# counts are totals for the server, divided between the worker processes
+REPORT_CONCURRENCY = per_worker(int(os.getenv("REPORT_CONCURRENCY", 16)))
+REPORT_QUEUE_SIZE = per_worker(int(os.getenv("REPORT_QUEUE_SIZE", 32)))
+REPORT_QUEUE_TIMEOUT = float(os.getenv("REPORT_QUEUE_TIMEOUT", 2.0))
+
+RATE_LIMITS_COLLECTION = "rate_limits"
+
+
+class MemoryRateLimiter:
+    """Token buckets held in this process"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key, rate, burst):
+        """Take one token; returns 0 when allowed, else seconds until a token is available"""
+        per_second = rate / 60
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * per_second)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / per_second
+
+
+class MongoRateLimiter:
+    """Token buckets in a Mongo collection, shared by every worker and node"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def create_indexes(self):
+        # Idle buckets are full again by expires_at, so Mongo can drop them
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    async def take(self, key, rate, burst):
+        per_ms = rate / 60000
+        # Refill and take atomically on the server, using the server's clock
+        refilled = {"$min": [burst, {"$add": [
+            {"$ifNull": ["$tokens", burst]},
+            {"$multiply": [{"$subtract": ["$$NOW", {"$ifNull": ["$updated_at", "$$NOW"]}]}, per_ms]}
+        ]}]}
+        update = [
+            {"$set": {"tokens": refilled, "updated_at": "$$NOW"}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {
+                "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                "expires_at": {"$add": ["$$NOW", math.ceil(burst / per_ms)]}
+            }}
+        ]
+        try:
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Another worker created the bucket at the same moment; it exists now
+            bucket = await self.collection.find_one_and_update(
+                {"_id": key}, update, return_document=ReturnDocument.AFTER
+            )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / per_ms / 1000
+
+
+class AdmissionController:
+    """
+    Admission for the report endpoints: a per-user and a global token
+    bucket, then a bounded concurrency gate with a queue timeout. Requests
+    that do not get in are shed with 429 (user over quota) or 503 (service
+    overloaded) and a Retry-After header.
+    """
+
+    def __init__(self, limiter, user_rate=REPORT_USER_RATE, user_burst=REPORT_USER_BURST,
+                 global_rate=REPORT_GLOBAL_RATE, global_burst=REPORT_GLOBAL_BURST,
+                 concurrency=REPORT_CONCURRENCY, queue_size=REPORT_QUEUE_SIZE, queue_timeout=REPORT_QUEUE_TIMEOUT):
+        self.limiter = limiter
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = {"user_rate": 0, "global_rate": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def reject(self, reason, status_code, detail, retry_after):
+        self.shed[reason] += 1
+        ADMISSION_SHED.inc(reason)
+        raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+    async def check_rate(self, user_id):
+        """Take a token from the user's and the global bucket, or raise 429/503"""
+        retry_after = await self.limiter.take(f"user:{user_id}", self.user_rate, self.user_burst)
+        if retry_after:
+            self.reject("user_rate", 429, "Too many report requests, slow down", retry_after)
+        retry_after = await self.limiter.take("global", self.global_rate, self.global_burst)
+        if retry_after:
+            self.reject("global_rate", 503, "Report service is busy, try again later", retry_after)
+
+    async def acquire(self):
+        """Wait for a concurrency slot, or raise 503 when the queue is full or the wait times out"""
+        if not self._semaphore.locked():
+            # A free slot is taken without suspending
+            await self._semaphore.acquire()
+        elif self.waiting >= self.queue_size:
+            self.reject("queue_full", 503, "Report service is busy, try again later", self.queue_timeout)
+        else:
+            self.waiting += 1
+            ADMISSION_WAITING.inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.reject("queue_timeout", 503, "Report service is busy, try again later", self.queue_timeout)
+            finally:
+                self.waiting -= 1
+                ADMISSION_WAITING.dec()
+        self.active += 1
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def release(self):
+        self.active -= 1
+        ADMISSION_IN_FLIGHT.dec()
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def admit(self, user_id):
+        """Rate-limit and hold a concurrency slot for the duration of the block"""
+        await self.check_rate(user_id)
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        return {
+            "backend": type(self.limiter).__name__,
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": dict(self.shed)
+        }
+
+
+async def create_admission_controller(database):
+    """Build the admission controller with the limiter selected by ADMISSION_BACKEND"""
+    if ADMISSION_BACKEND == "mongo":
+        limiter = MongoRateLimiter(database.get_collection(RATE_LIMITS_COLLECTION))
+        await limiter.create_indexes()
+    elif ADMISSION_BACKEND == "memory":
+        limiter = MemoryRateLimiter()
+    else:
+        raise ValueError(f"Unknown ADMISSION_BACKEND: {ADMISSION_BACKEND}")
+    return AdmissionController(limiter)
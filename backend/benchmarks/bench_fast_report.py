@@ -0,0 +1,68 @@
+"""
+Measure how long the local report engine takes to build a report from
+already fetched symptoms and medications, for periods of up to a year.
+
+    python -m benchmarks.bench_fast_report --days 30 365 --per-day 5
+"""
+from datetime import datetime, timedelta
+import argparse
+import json
+import random
+import time
+
+from fast_report import build_fast_report
+
+SYMPTOMS = ["headache", "nausea", "fatigue", "dizziness", "joint pain", "insomnia", "cough", "back pain"]
+
+
+def report_inputs(days, per_day, medications, seed=7):
+    """Sorted symptom documents and medications added during the period, as fetch_report_data returns them"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    symptoms = []
+    for day in range(days):
+        for entry in range(per_day):
+            symptoms.append({
+                "name": rng.choice(SYMPTOMS),
+                "details": "worse in the afternoon, eased after resting",
+                "severity": rng.randint(1, 10),
+                "timestamp": start + timedelta(days=day, minutes=entry * 1440 // per_day + rng.randint(0, 30))
+            })
+    meds = [{
+        "name": f"medication {i}",
+        "dosage": "10mg",
+        "frequency": "daily",
+        "created_at": start + timedelta(days=days * (i + 1) // (medications + 1))
+    } for i in range(medications)]
+    return start, start + timedelta(days=days), symptoms, meds
+
+
+def measure(days, per_day, medications, iterations):
+    start, end, symptoms, meds = report_inputs(days, per_day, medications)
+    build_fast_report(start, end, symptoms, meds)
+
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        report = build_fast_report(start, end, symptoms, meds)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "days": days,
+        "symptoms": len(symptoms),
+        "medications": len(meds),
+        "report_kb": round(len(report.encode("utf-8")) / 1024, 1),
+        "build_ms_p50": round(timings[len(timings) // 2] * 1000, 2),
+        "build_ms_max": round(timings[-1] * 1000, 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the local report engine")
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--per-day", type=int, default=5)
+    parser.add_argument("--medications", type=int, default=6)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    print(json.dumps([measure(days, args.per_day, args.medications, args.iterations) for days in args.days], indent=2))
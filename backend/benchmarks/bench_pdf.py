@@ -0,0 +1,63 @@
+"""
+Measure render time, peak memory and output size of report PDFs, including
+a report long enough to fill about 20 pages.
+
+    python -m benchmarks.bench_pdf --pages 1 5 20
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.fake_groq import REPORT
+from pdf_render import parse_markdown, preload_fonts, render_pdf
+
+# Roughly how many copies of the canned report fill one page
+SECTIONS_PER_PAGE = 1.6
+
+
+def report_data(pages):
+    """A report shaped like build_report's output with non-latin text mixed in"""
+    section = REPORT + "\n\nNotes: *Müdigkeit*, **πονοκέφαλος**, ощущение усталости, 0–10 scale ≥ 7.\n\n"
+    return {
+        "report_period": {"start_date": "2025-01-01T00:00:00", "end_date": "2025-03-31T00:00:00"},
+        "generated_report": section * max(1, round(pages * SECTIONS_PER_PAGE))
+    }
+
+
+def measure(pages, iterations):
+    data = report_data(pages)
+    render_pdf(data)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        output = render_pdf(data)
+    render_s = (time.perf_counter() - started) / iterations
+
+    tracemalloc.start()
+    render_pdf(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    parse_markdown(data["generated_report"])
+    return {
+        "requested_pages": pages,
+        "pdf_pages": output.count(b"/Type /Page\n"),
+        "pdf_kb": round(len(output) / 1024, 1),
+        "parse_ms": round((time.perf_counter() - started) * 1000, 2),
+        "render_ms": round(render_s * 1000, 1),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark report PDF rendering")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    unicode_fonts = preload_fonts()
+    print(json.dumps({"font_preload_ms": round((time.perf_counter() - started) * 1000, 1), "unicode_fonts": unicode_fonts}))
+    print(json.dumps([measure(pages, args.iterations) for pages in args.pages], indent=2))
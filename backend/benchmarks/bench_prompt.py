@@ -0,0 +1,147 @@
+"""
+Compare report prompt size (and optionally LLM latency) between the old
+repr-of-dicts encoding and the compact, budgeted prompt builder, and the
+size of an update that slides an earlier report forward by one day.
+
+    python -m benchmarks.bench_prompt --days 30 180 365 --per-day 4
+    GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=x python -m benchmarks.bench_prompt --llm
+    LLM_BACKEND=fake python -m benchmarks.bench_prompt --llm
+"""
+from datetime import datetime, timedelta
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from prompts import PROMPT_TOKEN_BUDGET, SYSTEM_PROMPT, estimate_tokens
+
+SYMPTOM_NAMES = ["headache", "nausea", "fatigue", "dizziness", "joint pain", "cough"]
+DETAILS = [
+    "started in the morning",
+    "worse after meals",
+    "mild, went away after rest",
+    "woke up with it, lasted most of the day",
+    "same as yesterday",
+]
+
+
+def synthetic_data(days, per_day, seed=1):
+    """Report inputs shaped like fetch_report_data's output"""
+    rng = random.Random(seed)
+    end = datetime(2025, 1, 1)
+    symptom_data = []
+    for day in range(days):
+        for entry in range(per_day):
+            timestamp = end - timedelta(days=days - day, hours=-(8 + entry * 3), minutes=-rng.randrange(60))
+            symptom_data.append({
+                "name": rng.choice(SYMPTOM_NAMES),
+                "details": rng.choice(DETAILS),
+                "severity": rng.randint(1, 10),
+                "timestamp": timestamp.isoformat()
+            })
+    medication_data = [
+        {"name": "ibuprofen", "dosage": "200mg", "frequency": "twice daily"},
+        {"name": "cetirizine", "dosage": "10mg", "frequency": "once daily"},
+    ]
+    return end - timedelta(days=days), end, symptom_data, medication_data
+
+
+def legacy_messages(start, end, symptom_data, medication_data, report_format):
+    """The prompt as it was built before the compact encoding"""
+    user_content = f"""
+        Generate a detailed, professionally formatted health report timeline for the period from **{start.strftime('%B %d, %Y')}** to **{end.strftime('%B %d, %Y')}**.
+
+        # SYMPTOMS DATA:
+        {[{key: value for key, value in s.items() if key != "name"} for s in symptom_data]}
+
+        # MEDICATIONS DATA:
+        {medication_data}
+
+        Report format requested: {report_format}
+
+        Ensure the report uses proper hierarchical headings, bold for important information, italics for supporting details, and maintains a consistent formatting style throughout. Include clear section dividers and organize information in a logical flow that will render well in a PDF document.
+        """
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_content}]
+
+
+class CountingClient:
+    """Wraps a chat client to count calls and prompt size across map and reduce steps"""
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = 0
+        self.prompt_chars = 0
+        self.chat = self
+        self.completions = self
+
+    async def create(self, messages, **kwargs):
+        self.calls += 1
+        self.prompt_chars += sum(len(message["content"]) for message in messages)
+        return await self.client.chat.completions.create(messages=messages, **kwargs)
+
+
+async def run(days_list, per_day, llm):
+    from types import SimpleNamespace
+    from report_jobs import ReportJobManager
+    from llm import create_llm_client
+    from routes.reports import REPORT_MODEL, prepare_report_messages
+
+    app = SimpleNamespace(report_jobs=ReportJobManager(None))
+    client = create_llm_client() if llm else None
+    results = []
+    for days in days_list:
+        start, end, symptom_data, medication_data = synthetic_data(days, per_day)
+        legacy = legacy_messages(start, end, symptom_data, medication_data, "summary")
+        legacy_chars = sum(len(message["content"]) for message in legacy)
+        result = {
+            "days": days,
+            "symptoms": len(symptom_data),
+            "legacy_prompt_chars": legacy_chars,
+            "legacy_prompt_tokens_est": estimate_tokens(legacy[1]["content"]) + estimate_tokens(SYSTEM_PROMPT),
+        }
+
+        counting = CountingClient(client) if llm else CountingClient(None)
+        if llm:
+            started = time.perf_counter()
+            await client.chat.completions.create(messages=legacy, model=REPORT_MODEL)
+            result["legacy_llm_s"] = round(time.perf_counter() - started, 3)
+
+            started = time.perf_counter()
+            messages = await prepare_report_messages(app, counting, start, end, symptom_data, medication_data, "summary")
+            await counting.create(messages=messages, model=REPORT_MODEL)
+            result["compact_llm_s"] = round(time.perf_counter() - started, 3)
+            result["compact_llm_calls"] = counting.calls
+        else:
+            from prompts import build_report_messages, encode_medications, encode_symptoms
+            messages = build_report_messages(
+                start, end, encode_symptoms(symptom_data), encode_medications(medication_data), "summary"
+            )
+
+        final_chars = sum(len(message["content"]) for message in messages)
+        result["compact_prompt_chars"] = final_chars
+        result["compact_prompt_tokens_est"] = sum(estimate_tokens(message["content"]) for message in messages)
+        result["data_fits_budget"] = result["compact_prompt_tokens_est"] - estimate_tokens(SYSTEM_PROMPT) <= PROMPT_TOKEN_BUDGET
+
+        # The fake server's canned report stands in for the previous report
+        from benchmarks.fake_groq import REPORT
+        from prompts import build_incremental_messages, encode_symptoms
+        incremental = build_incremental_messages(
+            REPORT, start - timedelta(days=1), end - timedelta(days=1), start, end,
+            encode_symptoms(symptom_data[-per_day:]), None, "summary"
+        )
+        result["incremental_prompt_tokens_est"] = sum(estimate_tokens(message["content"]) for message in incremental)
+        results.append(result)
+    if client is not None:
+        await client.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark report prompt encoding")
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 180])
+    parser.add_argument("--per-day", type=int, default=3)
+    parser.add_argument("--llm", action="store_true", help="also time completions (set GROQ_BASE_URL for the fake server)")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.days, args.per_day, args.llm)), indent=2))
@@ -0,0 +1,105 @@
+"""
+Measure CPU time spent turning list_symptoms results into a response body.
+
+Compares the old path (str() on every _id, jsonable_encoder, JSONResponse)
+with the projection + FastJSONResponse path. With --endpoint it also drives
+the real route against MONGODB_URI and reports process CPU per request.
+
+    python -m benchmarks.bench_serialization --rows 100 1000
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=bench python -m benchmarks.bench_serialization --endpoint
+"""
+from datetime import datetime, timedelta
+from bson import ObjectId
+import argparse
+import asyncio
+import json
+import time
+
+
+def symptom_documents(rows, user_id):
+    """Documents shaped like the ones pymongo returns for list_symptoms"""
+    now = datetime(2025, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "name": "headache",
+        "details": "throbbing pain behind the eyes, worse in the afternoon",
+        "severity": i % 10 + 1,
+        "user_id": user_id,
+        "timestamp": now - timedelta(minutes=i * 37)
+    } for i in range(rows)]
+
+
+def legacy_render(documents):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    for document in documents:
+        document["_id"] = str(document["_id"])
+    return JSONResponse(jsonable_encoder(documents)).body
+
+
+def fast_render(documents):
+    from utils import FastJSONResponse
+
+    return FastJSONResponse(documents).body
+
+
+def cpu_per_call(render, rows, iterations):
+    user_id = str(ObjectId())
+    batches = [symptom_documents(rows, user_id) for _ in range(iterations)]
+    started = time.process_time()
+    for documents in batches:
+        render(documents)
+    return (time.process_time() - started) / iterations
+
+
+async def endpoint_cpu(rows, iterations):
+    import httpx
+    import main
+    from symptom_storage import SYMPTOMS_COLLECTION
+
+    await main.startup_db_client()
+    try:
+        user_id = str(ObjectId())
+        documents = symptom_documents(rows, user_id)
+        for document in documents:
+            del document["_id"]
+        await main.app.database.get_collection(SYMPTOMS_COLLECTION).insert_many(documents)
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            url = f"/api/symptoms/{user_id}?limit={rows}"
+            await client.get(url)
+            started = time.process_time()
+            for _ in range(iterations):
+                response = await client.get(url)
+                response.raise_for_status()
+            cpu = (time.process_time() - started) / iterations
+
+        await main.app.database.get_collection(SYMPTOMS_COLLECTION).delete_many({"user_id": user_id})
+        return cpu
+    finally:
+        await main.shutdown_db_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list_symptoms serialization")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--endpoint", action="store_true", help="also time the route against MONGODB_URI")
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        legacy = cpu_per_call(legacy_render, rows, args.iterations)
+        fast = cpu_per_call(fast_render, rows, args.iterations)
+        result = {
+            "rows": rows,
+            "legacy_encode_cpu_ms": round(legacy * 1000, 3),
+            "fast_encode_cpu_ms": round(fast * 1000, 3),
+            "speedup": round(legacy / fast, 1) if fast else None
+        }
+        if args.endpoint:
+            result["endpoint_cpu_ms"] = round(asyncio.run(endpoint_cpu(rows, args.iterations)) * 1000, 3)
+        results.append(result)
+    print(json.dumps(results, indent=2))
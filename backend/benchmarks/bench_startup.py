@@ -0,0 +1,91 @@
+"""
+Measure cold start: how long `import main` takes in a fresh interpreter and
+how long a fresh uvicorn process takes to answer its first request.
+
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=bench python -m benchmarks.bench_startup
+
+The first request goes to --path (a Mongo-backed route by default); use
+--path /metrics to time startup without a reachable mongod.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "import_s": elapsed,
+    "loaded": {name: name in sys.modules for name in ("groq", "fpdf", "httpx", "orjson")}
+}))
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_first_request(path, timeout):
+    """Seconds from spawning uvicorn until path answers, polled every 5ms"""
+    import httpx
+
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    response = client.get(path)
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                return time.perf_counter() - started, response.status_code
+        raise TimeoutError(f"No response from {path} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark import time and time to first request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/api/users/?limit=1")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    # Run from the backend directory so main and its modules import
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    imports = [measure_import() for _ in range(args.runs)]
+    first_requests = [measure_first_request(args.path, args.timeout) for _ in range(args.runs)]
+    print(json.dumps({
+        "runs": args.runs,
+        "import_ms_median": round(statistics.median(run["import_s"] for run in imports) * 1000, 1),
+        "import_ms_min": round(min(run["import_s"] for run in imports) * 1000, 1),
+        "loaded_at_import": imports[-1]["loaded"],
+        "first_request_path": args.path,
+        "first_request_status": first_requests[-1][1],
+        "first_request_ms_median": round(statistics.median(elapsed for elapsed, _ in first_requests) * 1000, 1),
+        "first_request_ms_min": round(min(elapsed for elapsed, _ in first_requests) * 1000, 1)
+    }, indent=2))
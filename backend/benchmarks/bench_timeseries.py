@@ -0,0 +1,135 @@
+"""
+Compare storage size and range-query latency of symptoms kept in a plain
+collection against a time-series collection holding the same documents.
+
+Run from the backend directory against a local mongod (5.0+; 6.0+ for the
+secondary index on updated_at):
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_timeseries --users 50 --days 365 --per-day 4
+
+Both collections are created in the bench_timeseries database and dropped
+again unless --keep is given.
+"""
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ASCENDING, AsyncMongoClient
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from benchmarks.bench_prompt import DETAILS, SYMPTOM_NAMES
+from routes.symptoms import SYMPTOM_PROJECTION
+
+BENCH_DATABASE = "bench_timeseries"
+PLAIN = "symptoms_plain"
+TIMESERIES = "symptoms_ts"
+
+# Windows queried per run, in days: a week's list, a month's and a year's report
+RANGES = (7, 30, 365)
+
+
+def synthetic_symptoms(users, days, per_day, seed=1):
+    rng = random.Random(seed)
+    end = datetime(2025, 1, 1)
+    user_ids = [str(ObjectId()) for _ in range(users)]
+    documents = []
+    for user_id in user_ids:
+        for day in range(days):
+            for entry in range(per_day):
+                timestamp = end - timedelta(days=days - day, hours=-(8 + entry * 3), minutes=-rng.randrange(60))
+                documents.append({
+                    "_id": ObjectId(),
+                    "name": rng.choice(SYMPTOM_NAMES),
+                    "details": rng.choice(DETAILS),
+                    "severity": rng.randint(1, 10),
+                    "user_id": user_id,
+                    "timestamp": timestamp,
+                    "updated_at": timestamp
+                })
+    return user_ids, end, documents
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3)
+    }
+
+
+async def storage(database, name):
+    stats = await database.command("collStats", name)
+    return {
+        "count": stats.get("count"),
+        "size_bytes": stats.get("size"),
+        "storage_bytes": stats.get("storageSize"),
+        "index_bytes": stats.get("totalIndexSize")
+    }
+
+
+async def range_queries(collection, user_ids, end, queries):
+    results = {}
+    for days in RANGES:
+        start = end - timedelta(days=days)
+        latencies = []
+        for i in range(queries):
+            query = {"user_id": user_ids[i % len(user_ids)], "timestamp": {"$gte": start, "$lte": end}}
+            started = time.perf_counter()
+            await collection.find(query, SYMPTOM_PROJECTION).sort([("timestamp", 1), ("_id", 1)]).to_list(length=None)
+            latencies.append(time.perf_counter() - started)
+        results[f"{days}d"] = summarize(latencies)
+    return results
+
+
+async def run(users, days, per_day, queries, keep):
+    client = AsyncMongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    database = client[BENCH_DATABASE]
+    try:
+        await database.drop_collection(PLAIN)
+        await database.drop_collection(TIMESERIES)
+        await database.create_collection(TIMESERIES, timeseries={
+            "timeField": "timestamp", "metaField": "user_id", "granularity": "hours"
+        })
+
+        user_ids, end, documents = synthetic_symptoms(users, days, per_day)
+        for name in (PLAIN, TIMESERIES):
+            collection = database.get_collection(name)
+            started = time.perf_counter()
+            for i in range(0, len(documents), 10000):
+                # Documents carry their _id, so both collections hold identical copies
+                await collection.insert_many([dict(document) for document in documents[i:i + 10000]], ordered=False)
+            print(f"Loaded {len(documents)} symptoms into {name} in {time.perf_counter() - started:.1f}s")
+            await collection.create_index([("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)])
+            await collection.create_index([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)])
+
+        results = {"symptoms": len(documents), "users": users}
+        for label, name in (("collection", PLAIN), ("timeseries", TIMESERIES)):
+            collection = database.get_collection(name)
+            # One untimed pass so both layouts are measured with a warm cache
+            await range_queries(collection, user_ids, end, min(queries, len(user_ids)))
+            results[label] = {
+                "storage": await storage(database, name),
+                "range_queries": await range_queries(collection, user_ids, end, queries)
+            }
+        return results
+    finally:
+        if not keep:
+            await client.drop_database(BENCH_DATABASE)
+        await client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time-series symptom storage")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="leave the bench database in place")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.users, args.days, args.per_day, args.queries, args.keep)), indent=2))
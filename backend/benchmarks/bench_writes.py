@@ -0,0 +1,120 @@
+"""
+Measure latency and MongoDB round trips of the write endpoints.
+
+Run from the backend directory against a local mongod:
+
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=bench python -m benchmarks.bench_writes
+
+Compare the output between commits to see the effect of a change.
+"""
+from bson import ObjectId
+from pymongo import monitoring
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Count the commands sent to the server"""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def summarize(latencies, commands, requests):
+    latencies = sorted(latencies)
+    return {
+        "requests": requests,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 3),
+        "commands_per_request": round(commands / requests, 2)
+    }
+
+
+async def measure(counter, requests, send):
+    latencies = []
+    commands_before = counter.count
+    for i in range(requests):
+        started = time.perf_counter()
+        response = await send(i)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+    return summarize(latencies, counter.count - commands_before, requests)
+
+
+async def run(requests):
+    import httpx
+
+    counter = CommandCounter()
+    monitoring.register(counter)
+
+    # Imported after registering so the app's client picks up the listener
+    import main
+
+    await main.startup_db_client()
+    try:
+        user_id = str(ObjectId())
+        medication_ids = []
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def create_user(i):
+                return await client.post("/api/users/", json={
+                    "username": f"bench{i}",
+                    "email": f"bench-{user_id}-{i}@example.com",
+                    "unique_id_from_auth": str(i)
+                })
+
+            async def create_symptom(i):
+                return await client.post(f"/api/symptoms/?user_id={user_id}", json={
+                    "name": "headache", "details": "benchmark", "severity": i % 10 + 1
+                })
+
+            async def create_medication(i):
+                response = await client.post(f"/api/medications/?user_id={user_id}", json={
+                    "name": f"med{i}", "dosage": "10mg", "frequency": "daily"
+                })
+                medication_ids.append(response.json()["_id"])
+                return response
+
+            async def update_medication(i):
+                return await client.put(
+                    f"/api/medications/{medication_ids[i]}?user_id={user_id}",
+                    json={"dosage": "20mg"}
+                )
+
+            async def delete_medication(i):
+                return await client.delete(f"/api/medications/{medication_ids[i]}?user_id={user_id}")
+
+            results = {}
+            for name, send in [
+                ("create_user", create_user),
+                ("create_symptom", create_symptom),
+                ("create_medication", create_medication),
+                ("update_medication", update_medication),
+                ("delete_medication", delete_medication),
+            ]:
+                results[name] = await measure(counter, requests, send)
+        return results
+    finally:
+        await main.shutdown_db_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the write endpoints")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
@@ -0,0 +1,126 @@
+"""
+Local stand-in for the Groq chat completions API with configurable latency.
+
+    python -m benchmarks.fake_groq --port 8100 --latency 2.0 --first-token-latency 0.3
+
+Point the backend at it with GROQ_BASE_URL=http://127.0.0.1:8100 (any
+GROQ_API_KEY value is accepted).
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+# Latencies in seconds; the streaming variant spreads the remainder over the tokens
+LATENCY = float(os.getenv("FAKE_GROQ_LATENCY", 1.0))
+FIRST_TOKEN_LATENCY = float(os.getenv("FAKE_GROQ_FIRST_TOKEN_LATENCY", 0.2))
+
+REPORT = """# Health Report Summary
+
+**Report period:** see below. Symptoms were mostly *mild* with one *moderate* episode.
+
+---
+
+# Symptom Timeline
+
+| Date | Symptom | Severity |
+| --- | --- | --- |
+| 01/02/2025 | **Headache** | *4* |
+| 01/05/2025 | **Nausea** | *6* |
+
+---
+
+# Medications
+
+• **Ibuprofen** - *200mg* twice daily
+• **Cetirizine** - *10mg* once daily
+
+## Correlations
+
+Symptom severity decreased after starting **Ibuprofen**.
+
+---
+
+# Recommendations
+
+• Keep tracking symptoms daily
+• Discuss recurring headaches at the next visit
+"""
+
+app = FastAPI(title="Fake Groq API")
+app.state.requests = 0
+
+
+def count_tokens(text):
+    # Roughly four characters per token, close enough for load testing
+    return max(1, len(text) // 4)
+
+
+def completion_chunk(completion_id, model, delta, finish_reason=None):
+    return {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+
+
+@app.post("/openai/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.requests += 1
+    model = body.get("model", "fake-model")
+    completion_id = f"chatcmpl-fake-{app.state.requests}"
+    prompt_tokens = sum(count_tokens(message.get("content", "")) for message in body.get("messages", []))
+
+    if not body.get("stream"):
+        await asyncio.sleep(LATENCY)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": REPORT},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": count_tokens(REPORT),
+                "total_tokens": prompt_tokens + count_tokens(REPORT)
+            }
+        }
+
+    tokens = re.findall(r"\S+\s*|\s+", REPORT)
+    token_delay = max(LATENCY - FIRST_TOKEN_LATENCY, 0) / len(tokens)
+
+    async def chunks():
+        await asyncio.sleep(FIRST_TOKEN_LATENCY)
+        yield f"data: {json.dumps(completion_chunk(completion_id, model, {'role': 'assistant', 'content': ''}))}\n\n"
+        for token in tokens:
+            yield f"data: {json.dumps(completion_chunk(completion_id, model, {'content': token}))}\n\n"
+            await asyncio.sleep(token_delay)
+        yield f"data: {json.dumps(completion_chunk(completion_id, model, {}, 'stop'))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a fake Groq API server")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=LATENCY, help="seconds until the full completion")
+    parser.add_argument("--first-token-latency", type=float, default=FIRST_TOKEN_LATENCY)
+    args = parser.parse_args()
+
+    LATENCY = args.latency
+    FIRST_TOKEN_LATENCY = args.first_token_latency
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
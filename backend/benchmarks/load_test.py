@@ -0,0 +1,426 @@
+"""
+Load test the API: seed per-user data, then drive each route at a fixed
+concurrency and report throughput (requests/s and body MB/s) and latency
+percentiles per endpoint.
+
+The app from main.py and the fake Groq server run in this process on free
+ports. Against a local mongod:
+
+    MONGODB_URI=mongodb://localhost:27017 DATABASE_NAME=bench python -m benchmarks.load_test --output before.json
+
+Without a mongod, --mongomock runs on an in-memory stand-in (pip install
+mongomock; symptom search is skipped since mongomock has no text indexes).
+--url drives an already running server instead, which then needs its own
+GROQ_BASE_URL. --workers N serves the app from N worker processes; compare
+runs with 1, 2, 4... workers to see how throughput scales with cores. Diff
+the JSON outputs of two commits to compare them.
+"""
+from datetime import datetime, timedelta, timezone
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+SYMPTOM_NAMES = ["headache", "nausea", "fatigue", "dizziness", "joint pain", "cough"]
+DETAILS = [
+    "started in the morning",
+    "worse after meals",
+    "mild, went away after rest",
+    "woke up with it, lasted most of the day",
+    "same as yesterday",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve_in_thread(app, port):
+    """Run an ASGI app with uvicorn on its own thread and event loop"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def use_mongomock():
+    """Point database.py at mongomock before main.py connects"""
+    import mongomock
+    import mongomock.collection
+
+    os.environ["MONGO_DRIVER"] = "sync"
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("DATABASE_NAME", "load_test")
+    import database
+    database.MONGO_DRIVER = "sync"
+    database.MongoClient = mongomock.MongoClient
+
+    # mongomock's bulk_write does not understand pymongo 4 request objects
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        for request in requests:
+            operation = type(request).__name__
+            if operation == "UpdateOne":
+                self.update_one(request._filter, request._doc, upsert=request._upsert)
+            elif operation == "InsertOne":
+                self.insert_one(request._doc)
+            elif operation == "ReplaceOne":
+                self.replace_one(request._filter, request._doc, upsert=request._upsert)
+            elif operation == "DeleteOne":
+                self.delete_one(request._filter)
+            else:
+                raise NotImplementedError(operation)
+    mongomock.collection.Collection.bulk_write = bulk_write
+
+
+def start_worker_processes(workers, port):
+    """Run serving.py with several workers; returns the process once it answers"""
+    import httpx
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "serving.py", "--workers", str(workers), "--host", "127.0.0.1", "--port", str(port)], cwd=backend
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("serving.py exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"Workers on port {port} did not start")
+
+
+def start_servers(args):
+    """Start the fake Groq server and the app; returns the app's base URL and the servers"""
+    from benchmarks import fake_groq
+
+    fake_groq.LATENCY = args.llm_latency
+    fake_groq.FIRST_TOKEN_LATENCY = min(args.llm_first_token_latency, args.llm_latency)
+    groq_port = free_port()
+    servers = [serve_in_thread(fake_groq.app, groq_port)]
+
+    os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{groq_port}"
+    os.environ.setdefault("GROQ_API_KEY", "load-test")
+    # Measure the endpoints rather than admission control, unless limits are set explicitly
+    for name in ("REPORT_USER_RATE", "REPORT_USER_BURST", "REPORT_GLOBAL_RATE", "REPORT_GLOBAL_BURST"):
+        os.environ.setdefault(name, "1000000")
+    app_port = free_port()
+    if args.workers > 1:
+        # The workers read these from the environment they inherit
+        return f"http://127.0.0.1:{app_port}", servers, start_worker_processes(args.workers, app_port)
+    if args.mongomock:
+        use_mongomock()
+
+    import main
+
+    servers.append(serve_in_thread(main.app, app_port))
+    return f"http://127.0.0.1:{app_port}", servers, None
+
+
+def percentile(latencies, fraction):
+    """Nearest-rank percentile of sorted latencies"""
+    return latencies[min(len(latencies) - 1, max(0, math.ceil(fraction * len(latencies)) - 1))]
+
+
+def summarize(latencies, statuses, elapsed, body_bytes=0):
+    latencies = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": {str(status): count for status, count in sorted(statuses.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "throughput_mb_s": round(body_bytes / elapsed / 1e6, 2) if elapsed else None,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2)
+    }
+
+
+async def drive(client, requests, concurrency, send):
+    """Issue requests from concurrency workers, recording latency, status and body size of each"""
+    latencies = []
+    statuses = {}
+    body_bytes = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal body_bytes, next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await send(client, index)
+                status = response.status_code
+                body_bytes += len(await response.aread())
+            except Exception:
+                status = 599
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started, body_bytes)
+
+
+def symptom_records(rng, count, days, now):
+    """Symptoms spread over the last days, a few per day like a real log"""
+    for _ in range(count):
+        yield {
+            "name": rng.choice(SYMPTOM_NAMES),
+            "details": rng.choice(DETAILS),
+            "severity": rng.randint(1, 10),
+            "timestamp": (now - timedelta(minutes=rng.randrange(days * 24 * 60))).isoformat()
+        }
+
+
+async def seed(client, args, run_id):
+    """Create users with symptom and medication histories through the API"""
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    user_ids = []
+    for index in range(args.users):
+        response = await client.post("/api/users/", json={
+            "username": f"load{index}",
+            "email": f"load-{run_id}-{index}@example.com",
+            "unique_id_from_auth": f"load-{run_id}-{index}"
+        })
+        response.raise_for_status()
+        user_id = response.json()["_id"]
+        user_ids.append(user_id)
+
+        body = "\n".join(json.dumps(record) for record in symptom_records(rng, args.symptoms_per_user, args.days, now))
+        response = await client.post(
+            f"/api/symptoms/bulk?user_id={user_id}",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+
+        for medication in range(args.medications_per_user):
+            response = await client.post(f"/api/medications/?user_id={user_id}", json={
+                "name": f"med{medication}", "dosage": "10mg", "frequency": "daily"
+            })
+            response.raise_for_status()
+    return user_ids
+
+
+def scenarios(args, user_ids, run_id):
+    """(name, send) pairs in the order they run; later ones reuse ids created earlier"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # Stored timestamps run a few hours ahead of UTC, so extend the range past now
+    report_range = {
+        "start_date": (now - timedelta(days=args.days + 1)).isoformat(),
+        "end_date": (now + timedelta(days=1)).isoformat()
+    }
+    medication_ids = []
+
+    def user(index):
+        return user_ids[index % len(user_ids)]
+
+    async def create_user(client, index):
+        return await client.post("/api/users/", json={
+            "username": f"bench{index}",
+            "email": f"bench-{run_id}-{index}@example.com",
+            "unique_id_from_auth": f"bench-{run_id}-{index}"
+        })
+
+    async def get_user(client, index):
+        return await client.get(f"/api/users/{user(index)}")
+
+    async def list_users(client, index):
+        return await client.get("/api/users/", params={"limit": 100})
+
+    async def create_symptom(client, index):
+        return await client.post(f"/api/symptoms/?user_id={user(index)}", json={
+            "name": SYMPTOM_NAMES[index % len(SYMPTOM_NAMES)], "details": "load test", "severity": index % 10 + 1
+        })
+
+    async def list_symptoms(client, index):
+        return await client.get(f"/api/symptoms/{user(index)}", params={"limit": 100})
+
+    async def symptom_stats(client, index):
+        return await client.get(f"/api/symptoms/{user(index)}/stats", params={**report_range, "bucket": "week"})
+
+    async def search_symptoms(client, index):
+        return await client.get(f"/api/symptoms/{user(index)}/search", params={"q": SYMPTOM_NAMES[index % len(SYMPTOM_NAMES)]})
+
+    async def create_medication(client, index):
+        response = await client.post(f"/api/medications/?user_id={user(index)}", json={
+            "name": f"bench{index}", "dosage": "10mg", "frequency": "daily"
+        })
+        if response.status_code == 200:
+            medication_ids.append((user(index), response.json()["_id"]))
+        return response
+
+    async def list_medications(client, index):
+        return await client.get(f"/api/medications/{user(index)}")
+
+    async def update_medication(client, index):
+        user_id, medication_id = medication_ids[index % len(medication_ids)]
+        return await client.put(f"/api/medications/{medication_id}?user_id={user_id}", json={"dosage": "20mg"})
+
+    async def delete_medication(client, index):
+        user_id, medication_id = medication_ids[index]
+        return await client.delete(f"/api/medications/{medication_id}?user_id={user_id}")
+
+    async def report(client, index):
+        params = {**report_range, "refresh": "true"} if args.refresh_reports else report_range
+        return await client.get(f"/api/reports/{user(index)}", params=params)
+
+    async def report_pdf(client, index):
+        return await client.get(f"/api/reports/{user(index)}/pdf", params=report_range)
+
+    async def export_ndjson(client, index):
+        return await client.get(f"/api/users/{user(index)}/export", params={"format": "ndjson"})
+
+    async def export_csv(client, index):
+        return await client.get(f"/api/users/{user(index)}/export", params={"format": "csv"})
+
+    async def export_gzip(client, index):
+        return await client.get(f"/api/users/{user(index)}/export", params={"format": "ndjson", "gzip": "true"})
+
+    steps = [
+        ("create_user", create_user),
+        ("get_user", get_user),
+        ("list_users", list_users),
+        ("create_symptom", create_symptom),
+        ("list_symptoms", list_symptoms),
+        ("symptom_stats", symptom_stats),
+        ("search_symptoms", search_symptoms),
+        ("create_medication", create_medication),
+        ("list_medications", list_medications),
+        ("update_medication", update_medication),
+        ("delete_medication", delete_medication),
+        ("report", report),
+        ("report_pdf", report_pdf),
+        ("export_ndjson", export_ndjson),
+        ("export_csv", export_csv),
+        ("export_gzip", export_gzip),
+    ]
+    if args.mongomock:
+        steps = [step for step in steps if step[0] != "search_symptoms"]
+    if args.only:
+        steps = [step for step in steps if step[0] in args.only]
+    return steps
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, base_url):
+    import httpx
+
+    run_id = f"{int(time.time())}-{random.randrange(1 << 16)}"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        user_ids = await seed(client, args, run_id)
+        seed_s = time.perf_counter() - started
+
+        endpoints = {}
+        for name, send in scenarios(args, user_ids, run_id):
+            # Reports and full exports are slow by design, so they get fewer requests
+            if name.startswith("report"):
+                requests = args.report_requests
+            elif name.startswith("export"):
+                requests = args.export_requests
+            else:
+                requests = args.requests
+            endpoints[name] = await drive(client, requests, args.concurrency, send)
+
+    return {
+        "revision": git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "mongo": "mongomock" if args.mongomock else ("external" if args.url else os.getenv("MONGODB_URI")),
+            "users": args.users,
+            "symptoms_per_user": args.symptoms_per_user,
+            "medications_per_user": args.medications_per_user,
+            "days": args.days,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "report_requests": args.report_requests,
+            "export_requests": args.export_requests,
+            "refresh_reports": args.refresh_reports,
+            "llm_latency": args.llm_latency
+        },
+        "seed_s": round(seed_s, 2),
+        "endpoints": endpoints
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API routes")
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--mongomock", action="store_true", help="use an in-memory mongomock database")
+    parser.add_argument("--workers", type=int, default=1, help="serve the app from this many worker processes")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--symptoms-per-user", type=int, default=500)
+    parser.add_argument("--medications-per-user", type=int, default=5)
+    parser.add_argument("--days", type=int, default=180, help="days of history per user")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--report-requests", type=int, default=50, help="requests per report endpoint")
+    parser.add_argument("--export-requests", type=int, default=50, help="requests per export endpoint")
+    parser.add_argument("--refresh-reports", action="store_true", help="bypass the report cache")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="seconds the fake Groq server takes")
+    parser.add_argument("--llm-first-token-latency", type=float, default=0.2)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="+", help="only run these endpoints")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.workers > 1 and args.mongomock:
+        parser.error("--mongomock keeps data in one process, so it cannot be combined with --workers")
+
+    servers = []
+    workers = None
+    base_url = args.url
+    if base_url is None:
+        base_url, servers, workers = start_servers(args)
+    try:
+        result = asyncio.run(run(args, base_url))
+    finally:
+        if workers is not None:
+            # SIGTERM lets the workers drain like a deploy would
+            workers.terminate()
+            workers.wait(timeout=60)
+        for server, thread in reversed(servers):
+            server.should_exit = True
+            thread.join(timeout=10)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
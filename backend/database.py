@@ -1,18 +1,150 @@
-from pymongo import MongoClient
+from itertools import islice
+from pymongo import AsyncMongoClient, MongoClient
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 import os
 
+from metrics import mongo_event_listeners
+from serving import per_worker
+
 # Load environment variables
 load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 DATABASE_NAME = os.getenv("DATABASE_NAME")
 
-# MongoDB client
-client = MongoClient(MONGODB_URI)
-database = client[DATABASE_NAME]
+# "async" uses PyMongo's native asyncio client, "sync" keeps the blocking
+# client and runs each call in the threadpool (for A/B benchmarking)
+MONGO_DRIVER = os.getenv("MONGO_DRIVER", "async")
+
+# Connections to mongod across all worker processes (PyMongo's default for one)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+
+# The process-wide client, created on first use by connect_database
+_client = None
+_database = None
+
+
+def _forget_client_after_fork():
+    """A forked child must not use its parent's sockets; it connects again on first use"""
+    global _client, _database
+    _client = _database = None
+
+
+os.register_at_fork(after_in_child=_forget_client_after_fork)
+
+
+class ThreadedCursor:
+    """Awaitable wrapper around a blocking pymongo cursor"""
+
+    batch_size = 100
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        # skip/limit/sort/... only build the query, so they can run inline
+        method = getattr(self._cursor, name)
+
+        def chain(*args, **kwargs):
+            method(*args, **kwargs)
+            return self
+
+        return chain
+
+    async def to_list(self, length=None):
+        return await run_in_threadpool(lambda: list(islice(self._cursor, length)))
+
+    async def explain(self):
+        return await run_in_threadpool(self._cursor.explain)
+
+    async def __aiter__(self):
+        while True:
+            batch = await run_in_threadpool(lambda: list(islice(self._cursor, self.batch_size)))
+            if not batch:
+                return
+            for document in batch:
+                yield document
+
+
+class ThreadedCollection:
+    """Blocking pymongo collection exposed through the async collection API"""
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    @property
+    def name(self):
+        return self._collection.name
+
+    def find(self, *args, **kwargs):
+        return ThreadedCursor(self._collection.find(*args, **kwargs))
+
+    async def aggregate(self, *args, **kwargs):
+        cursor = await run_in_threadpool(self._collection.aggregate, *args, **kwargs)
+        return ThreadedCursor(cursor)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
+
+
+class ThreadedDatabase:
+    """Blocking pymongo database exposed through the async database API"""
+
+    def __init__(self, database):
+        self._database = database
+
+    @property
+    def name(self):
+        return self._database.name
+
+    def get_collection(self, name, **kwargs):
+        return ThreadedCollection(self._database.get_collection(name, **kwargs))
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def __getattr__(self, name):
+        method = getattr(self._database, name)
+
+        async def call(*args, **kwargs):
+            return await run_in_threadpool(method, *args, **kwargs)
+
+        return call
+
+
+def connect_database():
+    """
+    Return the shared client and database handle selected by MONGO_DRIVER,
+    creating them on the first call. Every caller in the process shares
+    the one connection pool, sized to this worker's share of MONGO_MAX_POOL_SIZE.
+    """
+    global _client, _database
+    if _client is None:
+        pool_size = per_worker(MONGO_MAX_POOL_SIZE)
+        if MONGO_DRIVER == "async":
+            mongodb_client = AsyncMongoClient(MONGODB_URI, maxPoolSize=pool_size, event_listeners=mongo_event_listeners())
+            _database = mongodb_client[DATABASE_NAME]
+        elif MONGO_DRIVER == "sync":
+            mongodb_client = MongoClient(MONGODB_URI, maxPoolSize=pool_size, event_listeners=mongo_event_listeners())
+            _database = ThreadedDatabase(mongodb_client[DATABASE_NAME])
+        else:
+            raise ValueError(f"Unknown MONGO_DRIVER: {MONGO_DRIVER}")
+        _client = mongodb_client
+    return _client, _database
+
 
-# Collections
-symptoms_collection = database.get_collection("symptoms")
-medications_collection = database.get_collection("medications")
-users_collection = database.get_collection("users")
+async def close_database(mongodb_client):
+    """Close a client returned by connect_database"""
+    global _client, _database
+    if mongodb_client is _client:
+        _client = _database = None
+    if isinstance(mongodb_client, AsyncMongoClient):
+        await mongodb_client.close()
+    else:
+        mongodb_client.close()
@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ASCENDING
+import argparse
+import asyncio
+import os
+
+from symptom_storage import SYMPTOMS_COLLECTION
+from utils import keyset_filter, stored_now
+
+TOMBSTONES_COLLECTION = "tombstones"
+
+# What a client syncs, by response key, and the collection each is read from
+SYNC_COLLECTIONS = {"symptoms": SYMPTOMS_COLLECTION, "medications": "medications"}
+
+# Changes stamped within SYNC_OVERLAP seconds of a sync are sent again by the
+# next one, so a write whose updated_at was taken before a slower concurrent
+# write committed is not skipped. Clients apply changes idempotently by _id.
+SYNC_OVERLAP = float(os.getenv("SYNC_OVERLAP", 10))
+
+# Tombstones are kept this long; older sync tokens need a full re-list
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", 90))
+
+SYNC_SORT = ["updated_at", "_id"]
+MIN_OBJECT_ID = ObjectId("0" * 24)
+
+# Marks in the migrations collection that documents from before sync were stamped
+BACKFILL_MIGRATION_ID = "sync_updated_at"
+
+
+async def record_tombstone(database, user_id, collection_name, item_id):
+    """Record a deletion so clients learn about it on their next sync"""
+    await database.get_collection(TOMBSTONES_COLLECTION).insert_one({
+        "user_id": user_id,
+        "collection": collection_name,
+        "item_id": str(item_id),
+        "updated_at": stored_now(),
+        # Real UTC, since the TTL monitor compares against the server clock
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=SYNC_TOMBSTONE_DAYS)
+    })
+
+
+def token_expired(position):
+    """
+    Whether tombstones a client still needs may already have expired.
+    datetime.min positions are within documents that have no updated_at yet,
+    which only an unfinished backfill leaves behind; those never expire.
+    """
+    if position[0] == datetime.min:
+        return False
+    return position[0] < stored_now() - timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+
+def position_filter(position):
+    """Documents sorting after an (updated_at, _id) position"""
+    if position[0] == datetime.min:
+        # A missing updated_at sorts first, as Mongo sorts it with null
+        return {"$or": [{"updated_at": None, "_id": {"$gt": position[1]}}, {"updated_at": {"$ne": None}}]}
+    return keyset_filter(SYNC_SORT, list(position))
+
+
+async def fetch_changes(database, user_id, position, limit, projections):
+    """
+    Changes for a user after position, an (updated_at, _id) pair or None for
+    everything. Each collection is read in (updated_at, _id) order through its
+    user_id index, so the cost follows the number of changes. Returns
+    (changes, has_more, next_position); changes holds (collection, document)
+    pairs keyed like SYNC_COLLECTIONS, with tombstones under "tombstones".
+    """
+    query = {"user_id": user_id}
+    if position is not None:
+        query = {"$and": [query, position_filter(position)]}
+
+    changes = []
+    sources = [(name, collection_name, projections.get(name)) for name, collection_name in SYNC_COLLECTIONS.items()]
+    sources.append((TOMBSTONES_COLLECTION, TOMBSTONES_COLLECTION, {"collection": 1, "item_id": 1, "updated_at": 1}))
+    for name, collection_name, projection in sources:
+        # limit + 1 from each source is enough to fill and detect a further page of the merge
+        documents = await database.get_collection(collection_name).find(query, projection).sort(
+            [(field, ASCENDING) for field in SYNC_SORT]
+        ).limit(limit + 1).to_list(length=None)
+        changes.extend((name, document) for document in documents)
+
+    # Documents written before updated_at existed sort first, as Mongo sorts them
+    changes.sort(key=lambda change: (change[1].get("updated_at") or datetime.min, change[1]["_id"]))
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    next_position = position
+    if changes:
+        last = changes[-1][1]
+        next_position = (last.get("updated_at") or datetime.min, last["_id"])
+        settled = stored_now() - timedelta(seconds=SYNC_OVERLAP)
+        if not has_more and next_position[0] >= settled:
+            # Step back over the overlap window, but never before where this sync started
+            next_position = (settled, MIN_OBJECT_ID)
+            if position is not None and next_position < position:
+                next_position = position
+    elif position is None:
+        next_position = (stored_now() - timedelta(seconds=SYNC_OVERLAP), MIN_OBJECT_ID)
+
+    return changes, has_more, next_position
+
+
+async def backfill_updated_at(database):
+    """
+    Stamp updated_at on documents written before sync existed. They are
+    stamped now rather than with their own timestamps, like bulk imports:
+    they are new to sync clients, and an old stamp would make the tokens
+    that page through them look expired.
+    """
+    updated_at = stored_now()
+    symptoms = await database.get_collection(SYMPTOMS_COLLECTION).update_many(
+        {"updated_at": {"$exists": False}}, {"$set": {"updated_at": updated_at}}
+    )
+    medications = await database.get_collection("medications").update_many(
+        {"updated_at": {"$exists": False}}, {"$set": {"updated_at": updated_at}}
+    )
+    return symptoms.modified_count, medications.modified_count
+
+
+async def ensure_updated_at(database):
+    """Run the backfill once per database, before the app serves sync requests"""
+    from migrate_symptoms import MIGRATIONS_COLLECTION
+
+    migrations = database.get_collection(MIGRATIONS_COLLECTION)
+    if await migrations.find_one({"_id": BACKFILL_MIGRATION_ID}, {"_id": 1}):
+        return
+    symptoms, medications = await backfill_updated_at(database)
+    await migrations.update_one(
+        {"_id": BACKFILL_MIGRATION_ID},
+        {"$set": {"symptoms": symptoms, "medications": medications, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+
+async def main():
+    from database import connect_database, close_database
+
+    mongodb_client, database = connect_database()
+    try:
+        symptoms, medications = await backfill_updated_at(database)
+        print(f"Backfilled updated_at on {symptoms} symptoms and {medications} medications")
+    finally:
+        await close_database(mongodb_client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill updated_at so existing documents can be synced")
+    parser.parse_args()
+
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+from datetime import datetime
+from pymongo import ASCENDING
+import csv
+import io
+import json
+import os
+import zlib
+
+from symptom_storage import SYMPTOMS_COLLECTION
+from utils import json_default
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+# Documents fetched per cursor batch, and bytes buffered before a chunk is
+# sent; together they bound an export's memory regardless of history size
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", 64 * 1024))
+
+SYMPTOM_EXPORT_FIELDS = ["name", "details", "severity", "timestamp", "updated_at"]
+MEDICATION_EXPORT_FIELDS = ["name", "dosage", "frequency", "created_at", "updated_at"]
+
+# One CSV holds both kinds of record; columns a kind lacks stay empty
+CSV_COLUMNS = ["type", "_id", "name", "details", "severity", "dosage", "frequency", "timestamp", "created_at", "updated_at"]
+
+
+def export_sources(database, user_id):
+    """(type, cursor) pairs streamed in order: symptoms by time, then medications"""
+    symptoms = database.get_collection(SYMPTOMS_COLLECTION).find(
+        {"user_id": user_id}, {field: 1 for field in SYMPTOM_EXPORT_FIELDS}, batch_size=EXPORT_BATCH_SIZE
+    ).sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+    medications = database.get_collection("medications").find(
+        {"user_id": user_id}, {field: 1 for field in MEDICATION_EXPORT_FIELDS}, batch_size=EXPORT_BATCH_SIZE
+    ).sort("_id", ASCENDING)
+    return [("symptom", symptoms), ("medication", medications)]
+
+
+def ndjson_line(kind, document):
+    record = {"type": kind, **document}
+    if orjson is not None:
+        return orjson.dumps(record, default=json_default) + b"\n"
+    return json.dumps(record, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def export_records(database, user_id, export_format):
+    """Encoded lines of a user's history, yielded in chunks of about EXPORT_CHUNK_BYTES"""
+    buffer = io.StringIO() if export_format == "csv" else None
+    writer = csv.writer(buffer) if buffer is not None else None
+    chunk = []
+    size = 0
+
+    if writer is not None:
+        writer.writerow(CSV_COLUMNS)
+
+    for kind, cursor in export_sources(database, user_id):
+        async for document in cursor:
+            if writer is not None:
+                record = {"type": kind, **document}
+                writer.writerow([csv_value(record.get(column)) for column in CSV_COLUMNS])
+                if buffer.tell() >= EXPORT_CHUNK_BYTES:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            else:
+                line = ndjson_line(kind, document)
+                chunk.append(line)
+                size += len(line)
+                if size >= EXPORT_CHUNK_BYTES:
+                    yield b"".join(chunk)
+                    chunk, size = [], 0
+
+    if writer is not None:
+        yield buffer.getvalue().encode("utf-8")
+    elif chunk:
+        yield b"".join(chunk)
+
+
+async def gzip_chunks(chunks):
+    """Compress a byte stream into one gzip member as it is produced"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
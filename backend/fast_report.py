@@ -0,0 +1,200 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from itertools import groupby
+import os
+
+from utils import as_stored_datetime
+
+# report_format that selects this engine instead of the LLM
+FAST_REPORT_FORMAT = "fast"
+
+# Most rows in the symptom timeline; longer periods are grouped by day, then by week
+FAST_REPORT_TIMELINE_ROWS = int(os.getenv("FAST_REPORT_TIMELINE_ROWS", 120))
+
+# Days compared before and after a medication was added
+CO_OCCURRENCE_DAYS = int(os.getenv("CO_OCCURRENCE_DAYS", 14))
+
+# Severities from this value up are called out in the recommendations
+HIGH_SEVERITY = 8
+
+DISCLAIMER = "*Generated from the logged data without AI analysis. This report is not medical advice.*"
+
+
+def us_date(value):
+    return value.strftime("%m/%d/%Y")
+
+
+def cell(text):
+    """Table cell text on one line without column separators"""
+    return " ".join(str(text).replace("|", "/").split())
+
+
+def week_start(day: date):
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date):
+    return day.replace(day=1)
+
+
+def mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def table(header, rows):
+    lines = ["| " + " | ".join(header) + " |", "|" + "---|" * len(header)]
+    lines.extend("| " + " | ".join(row) + " |" for row in rows)
+    return "\n".join(lines)
+
+
+def group_days(symptoms):
+    """(day, entries) pairs of sorted symptoms; later groupings start from these"""
+    return [(day, list(entries)) for day, entries in groupby(symptoms, key=lambda s: s["timestamp"].date())]
+
+
+def regroup(days, period_of):
+    """Merge day groups into (period, entries) groups, e.g. by week"""
+    periods = defaultdict(list)
+    for day, entries in days:
+        periods[period_of(day)].extend(entries)
+    return list(periods.items())
+
+
+def timeline_rows(symptoms, days):
+    """Symptom rows per entry, or per day or week when entries would not fit"""
+    if len(symptoms) <= FAST_REPORT_TIMELINE_ROWS:
+        return ["Date", "Symptom", "Severity", "Details"], [
+            [f"**{us_date(s['timestamp'])}** {s['timestamp'].strftime('%H:%M')}", f"**{cell(s.get('name') or '-')}**",
+             f"*{s['severity']}/10*", cell(s.get("details", ""))]
+            for s in symptoms
+        ]
+
+    label, periods = "Date", days
+    if len(days) > FAST_REPORT_TIMELINE_ROWS:
+        label, periods = "Week of", regroup(days, week_start)
+
+    rows = []
+    for period, entries in periods:
+        names = Counter(entry.get("name") or "-" for entry in entries)
+        listed = ", ".join(f"**{cell(name)}**" + (f" x{count}" if count > 1 else "") for name, count in names.most_common(4))
+        if len(names) > 4:
+            listed += f", +{len(names) - 4} more"
+        rows.append([f"**{us_date(period)}**", listed, f"*{max(entry['severity'] for entry in entries)}/10*", str(len(entries))])
+    return [label, "Symptoms", "Peak severity", "Entries"], rows
+
+
+def trend_section(severities, days, start, end):
+    """Severity per week (per month beyond 120 days) and the direction over the period"""
+    by_month = (end - start).days > 120
+    rows = []
+    for period, entries in regroup(days, month_start if by_month else week_start):
+        values = [entry["severity"] for entry in entries]
+        rows.append([f"**{period.strftime('%m/%Y') if by_month else us_date(period)}**", str(len(values)),
+                     f"*{mean(values):.1f}*", str(min(values)), str(max(values))])
+
+    half = len(severities) // 2
+    first, second = mean(severities[:half]), mean(severities[half:])
+    if first is None or abs(second - first) < 0.5:
+        direction = "stable"
+        text = "Average severity stayed **stable** across the period."
+    else:
+        direction = "rising" if second > first else "falling"
+        text = f"Average severity was **{direction}**: *{first:.1f}* in the first half of the entries and *{second:.1f}* in the second."
+
+    header = ["Month" if by_month else "Week of", "Entries", "Mean severity", "Min", "Max"]
+    return direction, text + "\n\n" + table(header, rows)
+
+
+def co_occurrence(symptoms, medications, start, end):
+    """Severities logged in the days before and after each medication added during the period"""
+    window = timedelta(days=CO_OCCURRENCE_DAYS)
+    timestamps = [s["timestamp"] for s in symptoms]
+    severities = [s["severity"] for s in symptoms]
+    findings = []
+    for medication in medications:
+        added = medication.get("created_at")
+        if not isinstance(added, datetime) or not start <= added <= end:
+            continue
+        # symptoms are sorted, so each window is a slice found by bisection
+        first, middle, last = (bisect_left(timestamps, t) for t in (added - window, added, added + window))
+        findings.append((medication, added, severities[first:middle], severities[middle:last]))
+    return findings
+
+
+def build_fast_report(start, end, symptoms, medications):
+    """
+    Markdown report with the sections the LLM is asked for, computed from
+    the symptom and medication documents in one pass each. symptoms must be
+    sorted by timestamp, as fetch_report_data returns them.
+    """
+    start, end = as_stored_datetime(start), as_stored_datetime(end)
+    severities = [s["severity"] for s in symptoms]
+    days = group_days(symptoms)
+    names = Counter(s.get("name") or "-" for s in symptoms)
+    severity_by_name = defaultdict(list)
+    for symptom in symptoms:
+        severity_by_name[symptom.get("name") or "-"].append(symptom["severity"])
+    high = [s for s in symptoms if s["severity"] >= HIGH_SEVERITY]
+    peak = max(symptoms, key=lambda s: s["severity"])
+
+    sections = []
+
+    top = ", ".join(f"**{cell(name)}** ({count}x, mean *{mean(severity_by_name[name]):.1f}*)" for name, count in names.most_common(5))
+    sections.append(
+        "# Health Report Summary\n\n"
+        f"**Report period:** {us_date(start)} to {us_date(end)}\n\n"
+        f"**{len(symptoms)}** symptom entries on **{len(days)}** days, with a mean severity of *{mean(severities):.1f}/10*. "
+        f"The highest was *{peak['severity']}/10* (**{cell(peak.get('name') or '-')}**, {us_date(peak['timestamp'])}). "
+        f"**{len(medications)}** medications are recorded.\n\n"
+        f"Most frequent symptoms: {top}."
+    )
+
+    header, rows = timeline_rows(symptoms, days)
+    sections.append("# Symptom Timeline\n\n" + table(header, rows))
+
+    if medications:
+        rows = [
+            [f"**{cell(m['name'])}**", f"*{cell(m['dosage'])}*", cell(m["frequency"]),
+             us_date(m["created_at"]) if isinstance(m.get("created_at"), datetime) else "-"]
+            for m in medications
+        ]
+        sections.append("# Medications\n\n" + table(["Medication", "Dosage", "Frequency", "Added"], rows))
+    else:
+        sections.append("# Medications\n\nNo medications are recorded.")
+
+    direction, trend = trend_section(severities, days, start, end)
+    sections.append("# Severity Trends\n\n" + trend)
+
+    findings = co_occurrence(symptoms, medications, start, end)
+    lines = ["# Medication and Symptom Co-occurrence", ""]
+    increases = []
+    if findings:
+        lines.append(f"Symptoms in the {CO_OCCURRENCE_DAYS} days before and after each medication was added. "
+                     "These are co-occurrences in the log, not causes.")
+        lines.append("")
+        for medication, added, before, after in findings:
+            if before and after:
+                change = mean(after) - mean(before)
+                if change >= 1:
+                    increases.append(medication)
+                lines.append(f"- **{cell(medication['name'])}** (added {us_date(added)}): mean severity *{mean(before):.1f}* before, "
+                             f"*{mean(after):.1f}* after; {len(before)} entries before, {len(after)} after")
+            else:
+                lines.append(f"- **{cell(medication['name'])}** (added {us_date(added)}): too few entries on one side to compare")
+    else:
+        lines.append("No medication was added during the report period, so there is nothing to compare.")
+    sections.append("\n".join(lines))
+
+    recommendations = []
+    if high:
+        recommendations.append(f"- Discuss the **{len(high)}** entries at *{HIGH_SEVERITY}/10* or above with a healthcare provider, "
+                               f"the latest on **{us_date(high[-1]['timestamp'])}**")
+    if direction == "rising":
+        recommendations.append("- Severity has been **rising**; consider an earlier follow-up")
+    for medication in increases:
+        recommendations.append(f"- Mention the symptoms after starting **{cell(medication['name'])}** to the prescriber")
+    recommendations.append("- Keep logging symptoms and medication changes daily so trends stay visible")
+    sections.append("# Recommendations for Follow-up\n\n" + "\n".join(recommendations) + "\n\n" + DISCLAIMER)
+
+    return "\n\n---\n\n".join(sections) + "\n"
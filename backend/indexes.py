@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+import argparse
+import asyncio
+import logging
+import sys
+
+from symptom_storage import SYMPTOMS_COLLECTION, USE_TIMESERIES
+
+logger = logging.getLogger(__name__)
+
+SYMPTOM_INDEXES = [
+    IndexModel([("user_id", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], name="user_id_timestamp_id"),
+    IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], name="user_id_updated_at_id"),
+]
+if not USE_TIMESERIES:
+    # user_id prefix keeps each search within one user's entries; time-series
+    # collections cannot have text indexes, so search scans the user's entries there
+    SYMPTOM_INDEXES.append(IndexModel(
+        [("user_id", ASCENDING), ("name", TEXT), ("details", TEXT)],
+        name="user_id_text",
+        weights={"name": 3, "details": 1}
+    ))
+
+# Indexes required by the routes, per collection
+INDEXES = {
+    SYMPTOMS_COLLECTION: SYMPTOM_INDEXES,
+    "medications": [
+        IndexModel([("user_id", ASCENDING), ("_id", ASCENDING)], name="user_id_id"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], name="user_id_updated_at_id"),
+    ],
+    "tombstones": [
+        IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING), ("_id", ASCENDING)], name="user_id_updated_at_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "reports": [
+        IndexModel([("user_id", ASCENDING), ("report_format", ASCENDING), ("end", DESCENDING)], name="user_id_report_format_end"),
+        IndexModel([("user_id", ASCENDING), ("_id", DESCENDING)], name="user_id_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "symptom_daily_rollups": [
+        IndexModel([("user_id", ASCENDING), ("day", ASCENDING)], name="user_id_day_unique", unique=True),
+    ],
+}
+
+# Collections whose indexes enforce correctness rather than speed: the unique
+# email index is the only duplicate check create_user has, so these are built
+# before the app serves and startup fails without them
+REQUIRED_INDEXES = ("users",)
+
+
+def canonical_queries():
+    """The query each route issues, as (name, collection, filter)"""
+    user_id = "000000000000000000000000"
+    end = datetime.now()
+    start = end - timedelta(days=30)
+    queries = [
+        ("list_symptoms", SYMPTOMS_COLLECTION, {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}),
+        ("generate_report", SYMPTOMS_COLLECTION, {"user_id": user_id, "timestamp": {"$gte": start, "$lte": end}}),
+        ("list_medications", "medications", {"user_id": user_id}),
+        ("sync_symptoms", SYMPTOMS_COLLECTION, {"user_id": user_id, "updated_at": {"$gt": start}}),
+        ("sync_medications", "medications", {"user_id": user_id, "updated_at": {"$gt": start}}),
+        ("sync_tombstones", "tombstones", {"user_id": user_id, "updated_at": {"$gt": start}}),
+        ("create_user", "users", {"email": "check@example.com"}),
+    ]
+    if not USE_TIMESERIES:
+        queries.insert(2, ("search_symptoms", SYMPTOMS_COLLECTION, {"user_id": user_id, "$text": {"$search": "headache"}}))
+    return queries
+
+
+async def ensure_required_indexes(database):
+    """Create the REQUIRED_INDEXES, raising OperationFailure if one cannot be built"""
+    for collection_name in REQUIRED_INDEXES:
+        try:
+            await database.get_collection(collection_name).create_indexes(INDEXES[collection_name])
+        except OperationFailure as e:
+            logger.error("Could not create required indexes", extra={"collection": collection_name, "error": str(e)})
+            raise
+
+
+async def ensure_indexes(database):
+    """Create the declared indexes; existing identical indexes are left alone"""
+    for collection_name, indexes in INDEXES.items():
+        if collection_name in REQUIRED_INDEXES:
+            continue
+        try:
+            await database.get_collection(collection_name).create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. a conflicting index built by hand; keep serving without the index
+            logger.warning("Could not create indexes", extra={"collection": collection_name, "error": str(e)})
+
+
+def plan_stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from plan_stages(item)
+
+
+async def check_query_plans(database):
+    """Explain each canonical query and return the ones that scan the collection"""
+    collection_scans = []
+    for name, collection_name, query in canonical_queries():
+        explain = await database.get_collection(collection_name).find(query).explain()
+        stages = list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{name:<20} {collection_name:<12} {status:<8} {' > '.join(stages)}")
+        if status == "COLLSCAN":
+            collection_scans.append(name)
+    return collection_scans
+
+
+async def main(create):
+    from database import connect_database, close_database
+
+    mongodb_client, database = connect_database()
+    try:
+        if create:
+            await ensure_required_indexes(database)
+            await ensure_indexes(database)
+        return await check_query_plans(database)
+    finally:
+        await close_database(mongodb_client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create indexes and verify query plans")
+    parser.add_argument("--check-only", action="store_true", help="only explain queries, do not create indexes")
+    args = parser.parse_args()
+
+    collection_scans = asyncio.run(main(create=not args.check_only))
+    if collection_scans:
+        print(f"Collection scans found: {', '.join(collection_scans)}")
+        sys.exit(1)
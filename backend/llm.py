@@ -0,0 +1,264 @@
+from collections import deque
+from types import SimpleNamespace
+import asyncio
+import logging
+import os
+import random
+import re
+import time
+
+from metrics import LLM_HEDGES, LLM_RETRIES
+from serving import per_worker
+
+# "groq" calls the Groq API; "fake" answers locally for tests and benchmarks
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+
+# Deadlines in seconds; the read timeout applies to each read from the socket
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 5))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 60))
+# Pooled connections to Groq, shared between the worker processes
+LLM_MAX_CONNECTIONS = per_worker(int(os.getenv("LLM_MAX_CONNECTIONS", 20)))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", 60))
+
+# Retries on 429, 5xx and connection errors, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 0.5))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 8))
+
+# Hedging sends a second identical request when the first is slower than the
+# LLM_HEDGE_QUANTILE of recent latencies; off by default since it can double cost
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+# Fake backend latency in seconds
+LLM_FAKE_LATENCY = float(os.getenv("LLM_FAKE_LATENCY", 0.05))
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailable(Exception):
+    """Raised when the configured backend cannot be used, e.g. without an API key"""
+
+
+class GroqBackend:
+    """Groq chat completions over one pooled keep-alive HTTP client"""
+
+    def __init__(self, api_key, connect_timeout=LLM_CONNECT_TIMEOUT, read_timeout=LLM_READ_TIMEOUT,
+                 max_connections=LLM_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_connections = max_connections
+        self._client = None
+
+    def available(self):
+        return bool(self.api_key)
+
+    def client(self):
+        if not self.api_key:
+            raise LLMUnavailable("GROQ_API_KEY not found in environment variables")
+        if self._client is None:
+            # groq takes ~100ms to import, so it is loaded with the first call
+            from groq import AsyncGroq
+            import httpx
+
+            timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+            http_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                )
+            )
+            # Retries are handled by LLMClient so they can be counted and hedged
+            self._client = AsyncGroq(api_key=self.api_key, timeout=timeout, max_retries=0, http_client=http_client)
+        return self._client
+
+    async def create(self, messages, model, stream=False, **kwargs):
+        return await self.client().chat.completions.create(messages=messages, model=model, stream=stream, **kwargs)
+
+    def retry_after(self, error):
+        """Seconds to wait before retrying error, or None when it should not be retried"""
+        import groq
+
+        if isinstance(error, (groq.APIConnectionError, groq.APITimeoutError)):
+            return 0.0
+        if isinstance(error, groq.APIStatusError) and (error.status_code == 429 or error.status_code >= 500):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                return float(retry_after) if retry_after else 0.0
+            except ValueError:
+                return 0.0
+        return None
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+class FakeLLMError(Exception):
+    """Error raised by FakeBackend; status_code mirrors an HTTP status"""
+
+    def __init__(self, status_code, message="fake upstream error"):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class FakeBackend:
+    """
+    Local stand-in returning a canned markdown report after a fixed delay.
+    failures holds status codes to raise, one per call, before succeeding.
+    """
+
+    REPORT = """# Health Report Summary
+
+**Report period:** see below. Symptoms were mostly mild.
+
+---
+
+## Recommendations
+- Keep tracking symptoms daily
+"""
+
+    def __init__(self, latency=LLM_FAKE_LATENCY, report=None, failures=()):
+        self.latency = latency
+        self.report = report or self.REPORT
+        self.failures = deque(failures)
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    async def create(self, messages, model, stream=False, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.failures:
+            raise FakeLLMError(self.failures.popleft())
+        usage = SimpleNamespace(
+            prompt_tokens=sum(len(message["content"]) for message in messages) // 4,
+            completion_tokens=len(self.report) // 4
+        )
+        if stream:
+            return self.chunks(usage)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=self.report))],
+            usage=usage
+        )
+
+    async def chunks(self, usage):
+        tokens = re.findall(r"\S+\s*|\s+", self.report)
+        for index, token in enumerate(tokens):
+            last = index == len(tokens) - 1
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))],
+                x_groq=SimpleNamespace(usage=usage) if last else None
+            )
+
+    def retry_after(self, error):
+        status_code = getattr(error, "status_code", None)
+        return 0.0 if status_code == 429 or (status_code or 0) >= 500 else None
+
+    async def close(self):
+        pass
+
+
+class LLMClient:
+    """
+    Process-wide LLM client with retries and optional hedging in front of a
+    backend. Exposes chat.completions.create like the Groq SDK so callers
+    (and wrappers such as the prompt benchmark's) need not change.
+    """
+
+    def __init__(self, backend, max_retries=LLM_MAX_RETRIES, backoff_base=LLM_BACKOFF_BASE,
+                 backoff_max=LLM_BACKOFF_MAX, hedge=LLM_HEDGE, hedge_quantile=LLM_HEDGE_QUANTILE,
+                 hedge_min_samples=LLM_HEDGE_MIN_SAMPLES):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=500)
+        self.chat = self
+        self.completions = self
+
+    def available(self):
+        return self.backend.available()
+
+    def backoff(self, attempt, retry_after):
+        jitter = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(self.backoff_max, max(retry_after, jitter))
+
+    def hedge_delay(self):
+        """Latency after which a hedge is sent, or None while hedging is off or warming up"""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_quantile))]
+
+    async def attempt(self, messages, model, stream, **kwargs):
+        started = time.monotonic()
+        delay = None if stream else self.hedge_delay()
+        if delay is None:
+            response = await self.backend.create(messages, model, stream=stream, **kwargs)
+            if not stream:
+                self.latencies.append(time.monotonic() - started)
+            return response
+
+        primary = asyncio.create_task(self.backend.create(messages, model, **kwargs))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                LLM_HEDGES.inc("sent")
+                tasks.append(asyncio.create_task(self.backend.create(messages, model, **kwargs)))
+
+            # Take the first success; an error only counts once every request has failed
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            LLM_HEDGES.inc("won")
+                        self.latencies.append(time.monotonic() - started)
+                        return task.result()
+            return primary.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def create(self, messages, model, stream=False, **kwargs):
+        """Create a completion, retrying retryable failures up to max_retries times"""
+        attempt = 0
+        while True:
+            try:
+                return await self.attempt(messages, model, stream, **kwargs)
+            except Exception as e:
+                retry_after = self.backend.retry_after(e)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                LLM_RETRIES.inc()
+                logger.warning("Retrying LLM call", extra={"attempt": attempt + 1, "delay_s": round(delay, 3), "error": str(e)})
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def close(self):
+        await self.backend.close()
+
+
+def create_llm_client():
+    """Build the LLM client selected by LLM_BACKEND"""
+    if LLM_BACKEND == "groq":
+        backend = GroqBackend(os.environ.get("GROQ_API_KEY"))
+    elif LLM_BACKEND == "fake":
+        backend = FakeBackend()
+    else:
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
+    return LLMClient(backend)
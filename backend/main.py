@@ -1,20 +1,42 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
-from pymongo import MongoClient
+import asyncio
+import logging
 import os
 
-from routes import symptoms, medications, reports, users
+from routes import symptoms, medications, reports, sync, users
+from admission import create_admission_controller
+from database import connect_database, close_database
+from delta_sync import ensure_updated_at
+from indexes import ensure_indexes, ensure_required_indexes
+from llm import create_llm_client
+from logs import configure_logging
+from metrics import CONTENT_TYPE, METRICS_ENABLED, MetricsMiddleware, render_metrics
+from report_cache import create_pdf_cache, create_report_cache
+from report_jobs import create_report_job_manager
+from symptom_storage import ensure_symptom_storage
+from utils import FastJSONResponse
 
 
 # Load environment variables
 load_dotenv()
+configure_logging()
+
+logger = logging.getLogger(__name__)
+
+# "startup" waits for the index builds, "background" serves requests while
+# they run (they are no-ops once the indexes exist) and "off" skips them;
+# the required indexes (see indexes.py) are always built before serving
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "background")
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Symptom Tracker API",
     description="API for tracking symptoms, medications, and generating reports",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -33,22 +55,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+def log_index_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Index build failed", exc_info=task.exception())
+
 # MongoDB connection events
 @app.on_event("startup")
-def startup_db_client():
-    app.mongodb_client = MongoClient(os.getenv("MONGODB_URI"))
-    app.database = app.mongodb_client[os.getenv("DATABASE_NAME")]
-    print("Connected to the MongoDB database!")
+async def startup_db_client():
+    app.mongodb_client, app.database = connect_database()
+    await ensure_symptom_storage(app.database)
+    # The unique email index is what rejects duplicate users, so it is never deferred
+    await ensure_required_indexes(app.database)
+    # Documents from before sync get updated_at once, so clients can page through them
+    await ensure_updated_at(app.database)
+    app.index_task = None
+    if ENSURE_INDEXES == "startup":
+        await ensure_indexes(app.database)
+    elif ENSURE_INDEXES == "background":
+        app.index_task = asyncio.create_task(ensure_indexes(app.database))
+        app.index_task.add_done_callback(log_index_failure)
+    app.report_cache = await create_report_cache(app.database)
+    # PDF fonts are parsed by the first render, not here
+    app.pdf_cache = create_pdf_cache()
+    # One pooled LLM client per process; groq itself is imported on first use
+    app.llm = create_llm_client()
+    app.admission = await create_admission_controller(app.database)
+    app.report_jobs = await create_report_job_manager(app)
+    await app.report_jobs.start()
+    logger.info("Connected to the MongoDB database", extra={"database": app.database.name})
 
 @app.on_event("shutdown")
-def shutdown_db_client():
-    app.mongodb_client.close()
+async def shutdown_db_client():
+    # uvicorn has already waited for open requests; background jobs drain here
+    await app.report_jobs.stop()
+    await app.llm.close()
+    if app.index_task is not None:
+        app.index_task.cancel()
+    await close_database(app.mongodb_client)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Request, MongoDB, Groq and PDF metrics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
 
 # Include routers
 app.include_router(symptoms.router, tags=["symptoms"], prefix="/api/symptoms")
 app.include_router(medications.router, tags=["medications"], prefix="/api/medications")
 app.include_router(reports.router, tags=["reports"], prefix="/api/reports")
 app.include_router(users.router, tags=["users"], prefix="/api/users")
+app.include_router(sync.router, tags=["sync"], prefix="/api/sync")
 
 # Root endpoint
 @app.get("/", tags=["root"])
@@ -57,6 +115,7 @@ async def read_root():
 
 
 if __name__ == "__main__":
-    import uvicorn
-    port = int(os.getenv("PORT", 8000))  # Use Render's assigned port if available
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    from serving import WORKERS, run
+
+    # WEB_CONCURRENCY sets the worker processes; see serving.py
+    run(app if WORKERS == 1 else "main:app")
@@ -0,0 +1,247 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from pymongo import monitoring
+import os
+import threading
+import time
+
+# Set METRICS_ENABLED=false to skip the request middleware and Mongo listener
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() != "false"
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = []
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A labelled metric family; children are keyed by their label values"""
+
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            lines.extend(self.render_child(label_values, value))
+        return lines
+
+    def render_child(self, label_values, value):
+        return [f"{self.name}{format_labels(self.labels, label_values)} {value}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(label_values)
+            if child is None:
+                # Per-bucket counts (made cumulative when rendered), then sum
+                child = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def render_child(self, label_values, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = f'le="{bound}"'
+            lines.append(f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(self.labels, label_values)} {total}")
+        lines.append(f"{self.name}_count{format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+
+MONGO_DURATION = Histogram("mongo_command_duration_seconds", "MongoDB command latency", ("command", "collection"))
+MONGO_DOCUMENTS = Counter("mongo_command_documents_total", "Documents returned or written by MongoDB commands", ("command", "collection"))
+MONGO_FAILURES = Counter("mongo_command_failures_total", "Failed MongoDB commands", ("command", "collection"))
+
+LLM_DURATION = Histogram("llm_request_duration_seconds", "Groq completion latency", ("operation",), LLM_BUCKETS)
+LLM_FIRST_TOKEN = Histogram("llm_time_to_first_token_seconds", "Time until a streamed completion yields text", ("operation",), LLM_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by Groq", ("operation", "kind"))
+LLM_FAILURES = Counter("llm_request_failures_total", "Failed Groq completions", ("operation",))
+LLM_RETRIES = Counter("llm_retries_total", "LLM requests retried after a 429, 5xx or connection error")
+LLM_HEDGES = Counter("llm_hedges_total", "Hedged LLM requests sent, and how many beat the original", ("outcome",))
+
+REPORT_GENERATIONS = Counter("report_generations_total", "LLM reports written from scratch or updated from an earlier report", ("mode",))
+REPORT_FALLBACKS = Counter("report_fallbacks_total", "LLM reports replaced by the local report engine", ("reason",))
+
+PDF_RENDER_DURATION = Histogram("pdf_render_duration_seconds", "Report PDF render time")
+PDF_PAGES = Counter("pdf_pages_total", "Pages of report PDFs rendered")
+
+ADMISSION_SHED = Counter("admission_shed_total", "Report requests rejected by admission control", ("reason",))
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Report requests holding a concurrency slot")
+ADMISSION_WAITING = Gauge("admission_waiting", "Report requests queued for a concurrency slot")
+
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def route_template(scope):
+    """
+    The matched route as a template like /api/symptoms/{user_id}, which keeps
+    label cardinality low. Rebuilt from the path parameters because routes of
+    included routers only know their path relative to the prefix.
+    """
+    if "route" not in scope:
+        return "unmatched"
+    parameters = {str(value): name for name, value in scope.get("path_params", {}).items()}
+    return "/".join("{" + parameters[segment] + "}" if segment in parameters else segment
+                    for segment in scope["path"].split("/"))
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        HTTP_IN_FLIGHT.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec(method)
+            path = route_template(scope)
+            HTTP_DURATION.observe(elapsed, method, path)
+            HTTP_REQUESTS.inc(method, path, status)
+
+
+def command_collection(command_name, command):
+    if command_name == "getMore":
+        return command.get("collection", "")
+    collection = command.get(command_name)
+    return collection if isinstance(collection, str) else ""
+
+
+def reply_documents(reply):
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    return reply.get("n", 0) if isinstance(reply.get("n"), int) else 0
+
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Record duration and document counts of every command the client sends"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.request_id, event.connection_id)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        MONGO_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        documents = reply_documents(event.reply)
+        if documents:
+            MONGO_DOCUMENTS.inc(event.command_name, collection, amount=documents)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), "")
+        MONGO_DURATION.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_FAILURES.inc(event.command_name, collection)
+
+
+def mongo_event_listeners():
+    """Listeners to pass to new Mongo clients"""
+    return [MongoMetricsListener()] if METRICS_ENABLED else []
+
+
+@contextmanager
+def track_llm_call(operation):
+    """Time one Groq completion and count it as failed if it raises"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        LLM_FAILURES.inc(operation)
+        raise
+    finally:
+        LLM_DURATION.observe(time.perf_counter() - started, operation)
+
+
+def record_llm_usage(operation, usage):
+    """Count the prompt and completion tokens of a finished completion"""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(operation, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.inc(operation, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
@@ -0,0 +1,123 @@
+"""
+Copy symptoms from the plain collection into the time-series collection
+while the app keeps serving. Batches follow _id order and the position is
+checkpointed, so an interrupted run resumes where it stopped.
+
+    python migrate_symptoms.py --batch-size 1000 --pause 0.1
+    SYMPTOMS_STORAGE=timeseries uvicorn main:app   # switch reads and writes
+    python migrate_symptoms.py --verify            # copy what arrived meanwhile, then compare counts
+"""
+from datetime import datetime, timedelta, timezone
+from pymongo import ASCENDING
+import argparse
+import asyncio
+import os
+
+from bson import ObjectId
+
+from symptom_storage import PLAIN_SYMPTOMS_COLLECTION, TIMESERIES_SYMPTOMS_COLLECTION, create_timeseries_collection
+
+MIGRATIONS_COLLECTION = "migrations"
+MIGRATION_ID = "symptoms_timeseries"
+
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 1000))
+
+# Resume this many seconds before the checkpoint; inserts still in flight
+# when it was written can carry slightly older ObjectIds
+MIGRATION_OVERLAP = int(os.getenv("MIGRATION_OVERLAP", 60))
+
+
+async def load_checkpoint(database):
+    return await database.get_collection(MIGRATIONS_COLLECTION).find_one({"_id": MIGRATION_ID}) or {}
+
+
+async def save_checkpoint(database, last_id, copied):
+    await database.get_collection(MIGRATIONS_COLLECTION).update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"last_id": last_id, "updated_at": datetime.now(timezone.utc)}, "$inc": {"copied": copied}},
+        upsert=True
+    )
+
+
+async def copy_batch(target, batch):
+    """
+    Insert the documents of a batch the target does not have yet. Time-series
+    collections have no unique _id index, so existing ids are looked up first,
+    bounded by the batch's timestamps to stay within a few buckets.
+    """
+    documents = [document for document in batch if isinstance(document.get("timestamp"), datetime)]
+    if not documents:
+        return 0
+    timestamps = [document["timestamp"] for document in documents]
+    existing = {document["_id"] for document in await target.find({
+        "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)},
+        "_id": {"$in": [document["_id"] for document in documents]}
+    }, {"_id": 1}).to_list(length=None)}
+    missing = [document for document in documents if document["_id"] not in existing]
+    if missing:
+        await target.insert_many(missing, ordered=False)
+    return len(missing)
+
+
+async def migrate(database, batch_size=MIGRATION_BATCH_SIZE, pause=0.0):
+    """Copy symptoms past the checkpoint; returns how many were inserted"""
+    await create_timeseries_collection(database)
+    source = database.get_collection(PLAIN_SYMPTOMS_COLLECTION)
+    target = database.get_collection(TIMESERIES_SYMPTOMS_COLLECTION)
+
+    checkpoint = await load_checkpoint(database)
+    query = {}
+    if checkpoint.get("last_id") is not None:
+        resume_at = checkpoint["last_id"].generation_time - timedelta(seconds=MIGRATION_OVERLAP)
+        query = {"_id": {"$gte": ObjectId.from_datetime(resume_at)}}
+
+    total = 0
+    while True:
+        batch = await source.find(query).sort("_id", ASCENDING).limit(batch_size).to_list(length=None)
+        if not batch:
+            break
+        copied = await copy_batch(target, batch)
+        total += copied
+        await save_checkpoint(database, batch[-1]["_id"], copied)
+        print(f"Copied {copied} of {len(batch)} symptoms up to {batch[-1]['_id']}")
+        if len(batch) < batch_size:
+            break
+        query = {"_id": {"$gt": batch[-1]["_id"]}}
+        if pause:
+            await asyncio.sleep(pause)
+    return total
+
+
+async def verify(database):
+    """Symptom counts of both collections; they match once the copy has caught up"""
+    source = await database.get_collection(PLAIN_SYMPTOMS_COLLECTION).count_documents({"timestamp": {"$type": "date"}})
+    target = await database.get_collection(TIMESERIES_SYMPTOMS_COLLECTION).count_documents({})
+    return source, target
+
+
+async def main(args):
+    from database import connect_database, close_database
+
+    mongodb_client, database = connect_database()
+    try:
+        if args.reset:
+            await database.get_collection(MIGRATIONS_COLLECTION).delete_one({"_id": MIGRATION_ID})
+        total = await migrate(database, args.batch_size, args.pause)
+        print(f"Copied {total} symptoms into {TIMESERIES_SYMPTOMS_COLLECTION}")
+        if args.verify:
+            source, target = await verify(database)
+            print(f"{PLAIN_SYMPTOMS_COLLECTION}: {source}, {TIMESERIES_SYMPTOMS_COLLECTION}: {target}"
+                  + ("" if source == target else " (counts differ)"))
+    finally:
+        await close_database(mongodb_client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy symptoms into the time-series collection")
+    parser.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument("--verify", action="store_true", help="compare document counts afterwards")
+    parser.add_argument("--reset", action="store_true", help="start again from the first symptom")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
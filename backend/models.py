@@ -52,6 +52,10 @@ class SymptomCreate(BaseModel):
     details: str
     severity: int = Field(ge=1, le=10)
 
+class SymptomBulkCreate(SymptomCreate):
+    # Imports from other trackers keep their original time
+    timestamp: Optional[datetime] = None
+
 # Medication Model
 class MedicationModel(BaseModel):
     id: Optional[PyObjectId] = Field(default_factory=PyObjectId, alias="_id")
@@ -0,0 +1,354 @@
+import logging
+import os
+import re
+import threading
+import time
+
+from metrics import PDF_PAGES, PDF_RENDER_DURATION
+from report_cache import report_cache_key
+
+# TrueType fonts used for report PDFs; italics fall back to the upright faces
+PDF_FONT = os.getenv("PDF_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PDF_FONT_BOLD = os.getenv("PDF_FONT_BOLD", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+PDF_FONT_ITALIC = os.getenv("PDF_FONT_ITALIC", "")
+PDF_FONT_BOLD_ITALIC = os.getenv("PDF_FONT_BOLD_ITALIC", "")
+
+# Bump when the layout changes so cached PDFs are rendered again
+PDF_LAYOUT_VERSION = 1
+
+FONT_FAMILY = "report"
+HEADING_SIZES = {1: 16, 2: 13, 3: 11.5}
+BODY_SIZE = 10
+LINE_HEIGHT = 5.5
+
+HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+RULE = re.compile(r"^(-{3,}|\*{3,}|_{3,})$")
+BULLET = re.compile(r"^([-*+•])\s+(.*)$")
+NUMBERED = re.compile(r"^(\d+[.)])\s+(.*)$")
+TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?$")
+INLINE = re.compile(r"(\*\*\*[^*]+\*\*\*|\*\*[^*]+\*\*|\*[^*\s][^*]*\*|`[^`]+`)")
+
+_font_templates = None
+_font_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+render_stats = {"renders": 0, "pages": 0, "seconds": 0.0, "max_seconds": 0.0}
+
+
+def parse_inline(text):
+    """Split a line into (text, style) spans for **bold**, *italic* and ***both***"""
+    spans = []
+    for index, part in enumerate(INLINE.split(text)):
+        if not part:
+            continue
+        if index % 2 == 0:
+            spans.append((part, ""))
+        elif part.startswith("***"):
+            spans.append((part[3:-3], "BI"))
+        elif part.startswith("**"):
+            spans.append((part[2:-2], "B"))
+        elif part.startswith("`"):
+            spans.append((part[1:-1], ""))
+        else:
+            spans.append((part[1:-1], "I"))
+    return spans
+
+
+def plain_text(spans):
+    return "".join(text for text, _ in spans)
+
+
+def split_row(line):
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def parse_markdown(markdown):
+    """
+    Parse report markdown into a flat layout tree of heading, paragraph,
+    bullet, table and rule blocks.
+    """
+    blocks = []
+    paragraph = []
+    table = None
+
+    def flush():
+        nonlocal paragraph, table
+        if paragraph:
+            blocks.append({"type": "paragraph", "spans": parse_inline(" ".join(paragraph))})
+            paragraph = []
+        if table:
+            blocks.append({"type": "table", "rows": table})
+            table = None
+
+    for raw_line in (markdown or "").splitlines():
+        line = raw_line.strip()
+        if not line:
+            flush()
+            continue
+
+        if line.startswith("|"):
+            if paragraph:
+                flush()
+            if TABLE_SEPARATOR.match(line):
+                continue
+            table = table or []
+            table.append([parse_inline(cell) for cell in split_row(line)])
+            continue
+        if table:
+            flush()
+
+        if RULE.match(line):
+            flush()
+            blocks.append({"type": "rule"})
+            continue
+
+        match = HEADING.match(line)
+        if match:
+            flush()
+            blocks.append({"type": "heading", "level": len(match.group(1)), "spans": parse_inline(match.group(2))})
+            continue
+
+        match = BULLET.match(line) or NUMBERED.match(line)
+        if match:
+            flush()
+            indent = len(raw_line) - len(raw_line.lstrip())
+            marker = match.group(1) if match.re is NUMBERED else None
+            blocks.append({
+                "type": "bullet",
+                "level": min(indent // 2, 3),
+                "marker": marker,
+                "spans": parse_inline(match.group(2))
+            })
+            continue
+
+        paragraph.append(line)
+
+    flush()
+    return blocks
+
+
+def font_files():
+    files = {"": PDF_FONT, "B": PDF_FONT_BOLD or PDF_FONT}
+    files["I"] = PDF_FONT_ITALIC or files[""]
+    files["BI"] = PDF_FONT_BOLD_ITALIC or files["B"]
+    return files
+
+
+def preload_fonts():
+    """
+    Parse the TrueType fonts once per process. Each PDF then gets a copy of
+    the parsed metrics instead of reading and measuring the files again.
+    Returns False when the fonts (or fpdf itself) are missing.
+    """
+    global _font_templates
+    with _font_lock:
+        if _font_templates is not None:
+            return bool(_font_templates)
+
+        try:
+            import fpdf
+            from fpdf import FPDF
+        except ImportError:
+            return False
+
+        # Metrics are kept in memory, so skip fpdf's pickle cache next to the fonts
+        fpdf.set_global("FPDF_CACHE_MODE", 1)
+        files = font_files()
+        if not all(os.path.exists(path) for path in files.values()):
+            logger.warning("PDF fonts not found, falling back to core fonts", extra={"fonts": files})
+            _font_templates = {}
+            return False
+
+        scratch = FPDF()
+        for style, path in files.items():
+            scratch.add_font(FONT_FAMILY, style, path, uni=True)
+        _font_templates = {}
+        for style, path in files.items():
+            fontkey = FONT_FAMILY + style
+            _font_templates[fontkey] = (scratch.fonts[fontkey], scratch.font_files[fontkey], path)
+        return True
+
+
+def register_fonts(pdf):
+    """Add the preloaded fonts to a new document, mirroring FPDF.add_font"""
+    for fontkey, (font, font_file, path) in _font_templates.items():
+        pdf.fonts[fontkey] = {**font, "i": len(pdf.fonts) + 1, "subset": list(range(0, 32))}
+        pdf.font_files[fontkey] = dict(font_file)
+        pdf.font_files[path] = {"type": "TTF"}
+
+
+class ReportPDF:
+    """Renders a parsed report onto an FPDF document"""
+
+    def __init__(self, unicode_fonts):
+        from fpdf import FPDF
+
+        renderer = self
+
+        class Document(FPDF):
+            def footer(self):
+                self.set_y(-12)
+                renderer.set_style("I", 8)
+                self.cell(0, 6, f"Page {self.page_no()}", align="C")
+
+        self.unicode_fonts = unicode_fonts
+        self.pdf = Document()
+        if unicode_fonts:
+            register_fonts(self.pdf)
+        self.pdf.set_auto_page_break(True, margin=18)
+        self.pdf.set_margins(15, 15, 15)
+        self.width = self.pdf.w - self.pdf.l_margin - self.pdf.r_margin
+
+    def text(self, value):
+        # The core fonts only cover latin-1
+        if self.unicode_fonts:
+            return value
+        return value.replace("•", "-").encode("latin-1", "replace").decode("latin-1")
+
+    def set_style(self, style, size=BODY_SIZE):
+        family = FONT_FAMILY if self.unicode_fonts else "Helvetica"
+        self.pdf.set_font(family, style, size)
+
+    def write_spans(self, spans, size=BODY_SIZE, height=LINE_HEIGHT):
+        for text, style in spans:
+            self.set_style(style, size)
+            self.pdf.write(height, self.text(text))
+
+    def wrap(self, value, width):
+        """Break text into lines no wider than width in the current font"""
+        lines, line = [], ""
+        for word in value.split():
+            candidate = f"{line} {word}" if line else word
+            if line and self.pdf.get_string_width(candidate) > width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+        return lines
+
+    def heading(self, block):
+        size = HEADING_SIZES.get(block["level"], BODY_SIZE + 1)
+        self.pdf.ln(3 if block["level"] > 1 else 5)
+        self.set_style("B", size)
+        self.pdf.multi_cell(0, size * 0.5, self.text(plain_text(block["spans"])))
+        self.pdf.ln(1)
+
+    def paragraph(self, block):
+        self.write_spans(block["spans"])
+        self.pdf.ln(LINE_HEIGHT + 1.5)
+
+    def bullet(self, block):
+        indent = 4 + block["level"] * 5
+        left_margin = self.pdf.l_margin
+        self.pdf.set_x(left_margin + indent)
+        self.set_style("")
+        self.pdf.write(LINE_HEIGHT, self.text(block["marker"] or "•") + " ")
+        # Wrapped lines continue under the text rather than the marker
+        self.pdf.set_left_margin(left_margin + indent + 4)
+        self.write_spans(block["spans"])
+        self.pdf.set_left_margin(left_margin)
+        self.pdf.ln(LINE_HEIGHT + 0.5)
+
+    def rule(self, block):
+        self.pdf.ln(2)
+        y = self.pdf.get_y()
+        self.pdf.set_draw_color(160, 160, 160)
+        self.pdf.line(self.pdf.l_margin, y, self.pdf.l_margin + self.width, y)
+        self.pdf.set_draw_color(0, 0, 0)
+        self.pdf.ln(4)
+
+    def column_widths(self, rows):
+        self.set_style("B")
+        columns = max(len(row) for row in rows)
+        natural = [0.0] * columns
+        for row in rows:
+            for index, cell in enumerate(row):
+                natural[index] = max(natural[index], self.pdf.get_string_width(self.text(plain_text(cell))) + 4)
+        # Shrink wide columns proportionally so the table fits the page
+        total = sum(natural) or 1
+        scale = min(1.0, self.width / total)
+        minimum = min(self.width / columns, 18)
+        return [max(width * scale, minimum) for width in natural]
+
+    def table_row(self, row, widths, style, header=None):
+        self.set_style(style, BODY_SIZE - 1)
+        cells = [self.wrap(self.text(plain_text(row[index])) if index < len(row) else "", width - 2)
+                 for index, width in enumerate(widths)]
+        height = max(len(lines) for lines in cells) * (LINE_HEIGHT - 0.5) + 2
+        if self.pdf.get_y() + height > self.pdf.page_break_trigger:
+            self.pdf.add_page()
+            # Repeat the header at the top of a continued table
+            if header:
+                self.table_row(header, widths, "B")
+                self.set_style(style, BODY_SIZE - 1)
+        x, y = self.pdf.l_margin, self.pdf.get_y()
+        for lines, width in zip(cells, widths):
+            self.pdf.rect(x, y, width, height)
+            self.pdf.set_xy(x + 1, y + 1)
+            for line in lines:
+                self.pdf.cell(width - 2, LINE_HEIGHT - 0.5, line)
+                self.pdf.set_xy(x + 1, self.pdf.get_y() + LINE_HEIGHT - 0.5)
+            x += width
+        self.pdf.set_xy(self.pdf.l_margin, y + height)
+
+    def table(self, block):
+        rows = block["rows"]
+        widths = self.column_widths(rows)
+        self.pdf.ln(1)
+        self.table_row(rows[0], widths, "B")
+        for row in rows[1:]:
+            self.table_row(row, widths, "", header=rows[0])
+        self.pdf.ln(3)
+
+    def render(self, report_data, blocks):
+        self.pdf.add_page()
+        self.set_style("B", 18)
+        self.pdf.cell(0, 10, "Health Report", ln=True, align="C")
+        period = report_data["report_period"]
+        self.set_style("I", BODY_SIZE + 1)
+        self.pdf.cell(0, 8, self.text(f"Period: {period['start_date']} to {period['end_date']}"), ln=True, align="C")
+        self.pdf.ln(2)
+
+        for block in blocks:
+            getattr(self, block["type"])(block)
+
+        return self.pdf.output(dest="S").encode("latin-1")
+
+
+def render_pdf(report_data):
+    """Render a generated report into PDF bytes"""
+    started = time.perf_counter()
+    unicode_fonts = preload_fonts()
+    blocks = parse_markdown(report_data["generated_report"])
+    document = ReportPDF(unicode_fonts)
+    output = document.render(report_data, blocks)
+
+    elapsed = time.perf_counter() - started
+    PDF_RENDER_DURATION.observe(elapsed)
+    PDF_PAGES.inc(amount=document.pdf.page_no())
+    with _font_lock:
+        render_stats["renders"] += 1
+        render_stats["pages"] += document.pdf.page_no()
+        render_stats["seconds"] += elapsed
+        render_stats["max_seconds"] = max(render_stats["max_seconds"], elapsed)
+    return output
+
+
+def pdf_cache_key(report_data):
+    """Hash of everything printed in the PDF, so identical reports share one render"""
+    return report_cache_key(
+        layout=PDF_LAYOUT_VERSION,
+        fonts=font_files(),
+        report_period=report_data["report_period"],
+        generated_report=report_data["generated_report"]
+    )
+
+
+def pdf_render_stats():
+    renders = render_stats["renders"]
+    return {
+        "renders": renders,
+        "pages": render_stats["pages"],
+        "render_ms_mean": round(render_stats["seconds"] / renders * 1000, 1) if renders else None,
+        "render_ms_max": round(render_stats["max_seconds"] * 1000, 1) if renders else None
+    }
@@ -0,0 +1,210 @@
+import os
+
+# Approximate token budget for the data sections of a single report prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", 6000))
+
+SYSTEM_PROMPT = """You are a medical report generator that creates professionally formatted health timelines compatible with PDFMake. Generate a comprehensive health timeline based on the provided symptoms and medications data.
+        The timeline must include:
+        1. A title page with patient information and report period
+        2. A chronological list of symptoms with their dates and severity
+        3. A chronological list of medications with their start and end dates, and purposes
+        4. Analysis of potential correlations between medications and symptom changes
+        5. Recommendations for follow-up (without specific medical advice)
+
+        FORMATTING REQUIREMENTS:
+        - Use consistent heading levels: # for main sections, ## for subsections
+        - Format dates as MM/DD/YYYY for better readability
+        - Use **bold** for important information (dates, medication names, symptom names)
+        - Use *italics* for severity levels and medication dosages
+        - Use bullet points (•) for listing items within sections
+        - Include horizontal rules (---) between major sections
+        - Create tables using markdown format for medication schedules
+        - Keep paragraphs short and concise for better PDF rendering
+        - Use clear section headers with proper hierarchical structure
+        - Include a summary section at the beginning
+
+        The output should be in markdown format that can be easily converted to PDFMake-compatible structure."""
+
+SUMMARY_SYSTEM_PROMPT = """You condense symptom logs for a later report writer. Keep every date with a notable change, the highest and lowest severities with their dates, recurring symptoms with how often they occurred, and any details that hint at a cause. Write compact plain text, no markdown headings."""
+
+SYMPTOMS_HEADER = 'Symptom entries grouped by day (time | symptom | severity 1-10 | details; " = same as the line above):'
+MEDICATIONS_HEADER = "Medications (name | dosage | frequency):"
+
+
+def estimate_tokens(text: str):
+    """Rough token count; about four characters per token for English text"""
+    return len(text) // 4 + 1
+
+
+def encode_symptom_days(symptom_data):
+    """
+    Encode chronological symptoms as one compact table per day, returned as
+    (first_day, last_day, text) blocks. Repeated symptom names and details
+    are replaced by a ditto mark.
+    """
+    blocks = []
+    day, lines = None, []
+    previous_name = previous_details = None
+    for symptom in symptom_data:
+        timestamp = str(symptom["timestamp"])
+        if timestamp[:10] != day:
+            if lines:
+                blocks.append((day, day, "\n".join(lines)))
+            day, lines = timestamp[:10], [timestamp[:10]]
+            previous_name = previous_details = None
+        name = symptom.get("name", "")
+        details = " ".join(str(symptom["details"]).split())
+        lines.append(" | ".join([
+            timestamp[11:16],
+            '"' if name == previous_name else name,
+            str(symptom["severity"]),
+            '"' if details == previous_details else details
+        ]))
+        previous_name, previous_details = name, details
+    if lines:
+        blocks.append((day, day, "\n".join(lines)))
+    return blocks
+
+
+def encode_symptoms(symptom_data):
+    return "\n".join([SYMPTOMS_HEADER] + [block[2] for block in encode_symptom_days(symptom_data)])
+
+
+def encode_medications(medication_data, budget=None):
+    """Medication table; with a budget, rows past it are counted instead of listed"""
+    lines = [MEDICATIONS_HEADER]
+    size = estimate_tokens(MEDICATIONS_HEADER)
+    for index, medication in enumerate(medication_data):
+        line = f"{medication['name']} | {medication['dosage']} | {medication['frequency']}"
+        size += estimate_tokens(line)
+        if budget is not None and size > budget:
+            lines.append(f"... and {len(medication_data) - index} more medications")
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def pack_blocks(blocks, budget=PROMPT_TOKEN_BUDGET):
+    """Group consecutive (first_day, last_day, text) blocks into chunks that fit the token budget"""
+    chunks, chunk, size = [], [], 0
+    for block in blocks:
+        block_size = estimate_tokens(block[2])
+        if chunk and size + block_size > budget:
+            chunks.append(chunk)
+            chunk, size = [], 0
+        chunk.append(block)
+        size += block_size
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def fit_blocks(blocks, budget):
+    """
+    The latest (first_day, last_day, text) blocks that fit the token budget,
+    after a note naming the days left out; a single block that is too large
+    on its own is cut short
+    """
+    if sum(estimate_tokens(block[2]) for block in blocks) <= budget:
+        return blocks
+    note_budget = 40
+    kept, size = [], 0
+    for block in reversed(blocks):
+        block_size = estimate_tokens(block[2])
+        if size + block_size > budget - note_budget:
+            break
+        kept.append(block)
+        size += block_size
+    kept.reverse()
+    if not kept:
+        first_day, last_day, text = blocks[-1]
+        kept = [(first_day, last_day, text[:max(budget - note_budget, 0) * 4])]
+        omitted = blocks[:-1]
+    else:
+        omitted = blocks[:len(blocks) - len(kept)]
+    if not omitted:
+        return kept
+    note = f"Entries from {omitted[0][0]} to {omitted[-1][1]} were left out to fit the prompt size limit."
+    return [(omitted[0][0], omitted[-1][1], note)] + kept
+
+
+def build_report_messages(start, end, symptoms_text, medications_text, report_format, summarized=False):
+    """Build the chat messages sent to the LLM for a report"""
+    source = "SYMPTOM SUMMARIES BY PERIOD" if summarized else "SYMPTOMS DATA"
+    user_content = f"""
+        Generate a detailed, professionally formatted health report timeline for the period from **{start.strftime('%B %d, %Y')}** to **{end.strftime('%B %d, %Y')}**.
+
+        # {source}:
+{symptoms_text}
+
+        # MEDICATIONS DATA:
+{medications_text}
+
+        Report format requested: {report_format}
+
+        Ensure the report uses proper hierarchical headings, bold for important information, italics for supporting details, and maintains a consistent formatting style throughout. Include clear section dividers and organize information in a logical flow that will render well in a PDF document.
+        """
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": user_content
+        }
+    ]
+
+
+def build_incremental_messages(previous_report, previous_start, previous_end, start, end, symptoms_text,
+                               medications_text, report_format):
+    """
+    Build the chat messages that update an earlier report to a new period
+    from only the symptoms logged since it; medications_text is None when
+    the medications have not changed
+    """
+    if medications_text is None:
+        medications_text = "Unchanged since the previous report."
+    user_content = f"""
+        Below is a health report for **{previous_start.strftime('%B %d, %Y')}** to **{previous_end.strftime('%B %d, %Y')}**. Update it to cover **{start.strftime('%B %d, %Y')}** to **{end.strftime('%B %d, %Y')}**:
+        - Drop symptoms, statistics and observations from before {start.strftime('%B %d, %Y')}
+        - Add the new symptom entries below to the timeline, trends and analysis
+        - Keep everything else, including the structure and formatting, as it is
+
+        # PREVIOUS REPORT:
+{previous_report}
+
+        # NEW SYMPTOMS DATA (after {previous_end.strftime('%B %d, %Y')}):
+{symptoms_text}
+
+        # MEDICATIONS DATA:
+{medications_text}
+
+        Report format requested: {report_format}
+
+        Return the complete updated report in the same markdown format.
+        """
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": user_content
+        }
+    ]
+
+
+def build_summary_messages(first_day, last_day, text):
+    """Build the chat messages that condense one chunk of the symptom log"""
+    return [
+        {
+            "role": "system",
+            "content": SUMMARY_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Summarize the symptom log from {first_day} to {last_day}.\n\n{text}"
+        }
+    ]
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Cache configuration
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")
+REPORT_CACHE_TTL = int(os.getenv("REPORT_CACHE_TTL", 3600))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", 256))
+REPORT_CACHE_COLLECTION = "report_cache"
+# Rendered PDFs are keyed by content hash, so a small in-process cache is enough
+PDF_CACHE_MAX_ENTRIES = int(os.getenv("PDF_CACHE_MAX_ENTRIES", 64))
+
+
+def report_cache_key(**inputs):
+    """Hash the prompt inputs of a report into a stable cache key"""
+    payload = json.dumps(inputs, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=REPORT_CACHE_MAX_ENTRIES, ttl=REPORT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, user_id, value):
+        with self._lock:
+            self._entries[key] = (user_id, value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def invalidate_user(self, user_id):
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[0] == user_id]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    async def size(self):
+        return len(self._entries)
+
+
+class MongoCacheBackend:
+    """Cache stored in a Mongo collection so several workers can share it"""
+
+    def __init__(self, collection, ttl=REPORT_CACHE_TTL):
+        self.collection = collection
+        self.ttl = ttl
+
+    async def create_indexes(self):
+        # Mongo removes expired entries on its own through the TTL index
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+        await self.collection.create_index("user_id")
+
+    async def get(self, key):
+        entry = await self.collection.find_one({
+            "_id": key,
+            "expires_at": {"$gt": datetime.now(timezone.utc)}
+        })
+        return entry["value"] if entry else None
+
+    async def set(self, key, user_id, value):
+        await self.collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "user_id": user_id,
+                "value": value,
+                "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+            },
+            upsert=True
+        )
+
+    async def invalidate_user(self, user_id):
+        result = await self.collection.delete_many({"user_id": user_id})
+        return result.deleted_count
+
+    async def size(self):
+        return await self.collection.estimated_document_count()
+
+
+class ReportCache:
+    """Report cache with hit/miss accounting on top of a pluggable backend"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, key):
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key, user_id, value):
+        await self.backend.set(key, user_id, value)
+
+    async def invalidate_user(self, user_id):
+        """Drop cached reports for a user after their data changes"""
+        self.invalidations += await self.backend.invalidate_user(user_id)
+
+    async def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": await self.backend.size()
+        }
+
+
+async def create_report_cache(database):
+    """Build the report cache selected by REPORT_CACHE_BACKEND"""
+    if REPORT_CACHE_BACKEND == "mongo":
+        backend = MongoCacheBackend(database.get_collection(REPORT_CACHE_COLLECTION))
+        await backend.create_indexes()
+    elif REPORT_CACHE_BACKEND == "memory":
+        backend = MemoryCacheBackend()
+    else:
+        raise ValueError(f"Unknown REPORT_CACHE_BACKEND: {REPORT_CACHE_BACKEND}")
+    return ReportCache(backend)
+
+
+def create_pdf_cache():
+    """Build the in-process cache for rendered report PDFs"""
+    return ReportCache(MemoryCacheBackend(max_entries=PDF_CACHE_MAX_ENTRIES))
@@ -0,0 +1,352 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+import asyncio
+import logging
+import os
+import time
+
+from serving import WORKERS, per_worker
+
+logger = logging.getLogger(__name__)
+
+# Job configuration
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", 4))
+REPORT_JOB_QUEUE_SIZE = int(os.getenv("REPORT_JOB_QUEUE_SIZE", 100))
+REPORT_JOB_TTL = int(os.getenv("REPORT_JOB_TTL", 3600))
+# "memory" keeps job state in the worker that runs the job; "mongo" stores it
+# so any worker can answer for a job and identical jobs are merged across
+# workers, which several workers need
+REPORT_JOB_BACKEND = os.getenv("REPORT_JOB_BACKEND", "mongo" if WORKERS > 1 else "memory")
+REPORT_JOBS_COLLECTION = "report_jobs"
+# A job still unfinished this many seconds after it was queued counts as
+# abandoned by a worker that died, and no longer absorbs identical requests
+REPORT_JOB_LEASE = int(os.getenv("REPORT_JOB_LEASE", 900))
+# Upper bound on concurrent Groq calls from jobs and inline report requests,
+# shared between the worker processes
+LLM_CONCURRENCY = per_worker(int(os.getenv("LLM_CONCURRENCY", 8)))
+# Seconds a stopping worker lets queued and running jobs finish before cancelling them
+REPORT_JOB_DRAIN_TIMEOUT = float(os.getenv("REPORT_JOB_DRAIN_TIMEOUT", 20))
+
+
+class QueueFull(Exception):
+    """Raised when a job cannot be queued"""
+
+
+class ReportJob:
+    """A queued report generation and, once finished, its outcome"""
+
+    def __init__(self, user_id, start, end, report_format):
+        self.id = str(ObjectId())
+        self.user_id = user_id
+        self.start = start
+        self.end = end
+        self.report_format = report_format
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc)
+        self.queued_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def key(self):
+        # Requests resolving to the same days produce the same report
+        return (self.user_id, self.start.date(), self.end.date(), self.report_format)
+
+    def to_dict(self):
+        job = {
+            "job_id": self.id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "report_format": self.report_format,
+            "created_at": self.created_at.isoformat(),
+            "wait_ms": None,
+            "run_ms": None
+        }
+        if self.started_at is not None:
+            job["wait_ms"] = round((self.started_at - self.queued_at) * 1000, 1)
+        if self.finished_at is not None:
+            job["run_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.status == "succeeded":
+            job["result"] = self.result
+        if self.status == "failed":
+            job["error"] = self.error
+        return job
+
+
+class MongoJobStore:
+    """Job state in a Mongo collection shared by the worker processes"""
+
+    # Fields of a stored job that are not part of its public form
+    PRIVATE_FIELDS = {"_id": 0, "key": 0, "active": 0, "lease_until": 0, "expires_at": 0}
+
+    def __init__(self, collection, ttl=REPORT_JOB_TTL, lease=REPORT_JOB_LEASE):
+        self.collection = collection
+        self.ttl = ttl
+        self.lease = lease
+
+    async def create_indexes(self):
+        # One active job per key; finished jobs drop the active flag and leave the index
+        await self.collection.create_index(
+            [("key", ASCENDING)], name="active_key_unique", unique=True, partialFilterExpression={"active": True}
+        )
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    @staticmethod
+    def key(job):
+        user_id, start, end, report_format = job.key
+        return f"{user_id}:{start.isoformat()}:{end.isoformat()}:{report_format}"
+
+    async def claim(self, job):
+        """
+        Register job as the active one for its key, or return the public form
+        of an identical job another worker has active. Raises QueueFull when
+        neither can be settled.
+        """
+        now = datetime.now(timezone.utc)
+        key = self.key(job)
+        document = {
+            "_id": ObjectId(job.id),
+            "key": key,
+            "active": True,
+            "lease_until": now + timedelta(seconds=self.lease),
+            "expires_at": now + timedelta(seconds=self.lease + self.ttl),
+            **job.to_dict()
+        }
+        for _ in range(3):
+            try:
+                await self.collection.insert_one(document)
+                return None
+            except DuplicateKeyError:
+                pass
+            # Free the key if its job outlived its lease, then try again
+            abandoned = await self.collection.update_one(
+                {"key": key, "active": True, "lease_until": {"$lt": now}},
+                {"$unset": {"active": ""}, "$set": {
+                    "status": "failed", "error": {"status_code": 500, "detail": "Report job was abandoned"}
+                }}
+            )
+            if abandoned.modified_count:
+                continue
+            existing = await self.collection.find_one({"key": key, "active": True}, self.PRIVATE_FIELDS)
+            if existing is not None:
+                return existing
+            # It finished in the meantime; try again
+        raise QueueFull()
+
+    async def find_active(self, job):
+        """The public form of an identical job another worker has active, if any"""
+        return await self.collection.find_one({"key": self.key(job), "active": True}, self.PRIVATE_FIELDS)
+
+    async def update(self, job):
+        update = {"$set": job.to_dict()}
+        if job.finished_at is not None:
+            update["$unset"] = {"active": ""}
+        await self.collection.update_one({"_id": ObjectId(job.id)}, update)
+
+    async def discard(self, job):
+        await self.collection.delete_one({"_id": ObjectId(job.id)})
+
+    async def get(self, job_id):
+        if not ObjectId.is_valid(job_id):
+            return None
+        return await self.collection.find_one({"_id": ObjectId(job_id)}, self.PRIVATE_FIELDS)
+
+
+class ReportJobManager:
+    """Bounded worker pool generating reports in the background"""
+
+    def __init__(self, app, workers=REPORT_JOB_WORKERS, queue_size=REPORT_JOB_QUEUE_SIZE,
+                 llm_concurrency=LLM_CONCURRENCY, ttl=REPORT_JOB_TTL, store=None):
+        self.app = app
+        self.store = store
+        self.workers = workers
+        self.ttl = ttl
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self.in_flight = {}
+        self._tasks = []
+        self.stopping = False
+        self._llm_semaphore = asyncio.Semaphore(llm_concurrency)
+        self.llm_concurrency = llm_concurrency
+        self.llm_active = 0
+        self.llm_waiting = 0
+        self.running = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=1000)
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout=REPORT_JOB_DRAIN_TIMEOUT):
+        """Stop taking jobs, give queued and running ones drain_timeout seconds, then cancel the rest"""
+        self.stopping = True
+        if self._tasks and drain_timeout > 0:
+            try:
+                await asyncio.wait_for(self.queue.join(), drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Cancelling unfinished report jobs", extra={"running": self.running, "queued": self.queue.qsize()})
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @asynccontextmanager
+    async def llm_slot(self):
+        """Hold one of the LLM_CONCURRENCY upstream call slots"""
+        self.llm_waiting += 1
+        try:
+            await self._llm_semaphore.acquire()
+        finally:
+            self.llm_waiting -= 1
+        self.llm_active += 1
+        try:
+            yield
+        finally:
+            self.llm_active -= 1
+            self._llm_semaphore.release()
+
+    async def submit(self, user_id, start, end, report_format):
+        """
+        Queue a report, joining an identical job that is still queued or
+        running; returns the public form of the job
+        """
+        self._expire_jobs()
+        job = ReportJob(user_id, start, end, report_format)
+        existing = self.in_flight.get(job.key)
+        if existing is not None:
+            self.coalesced += 1
+            return existing.to_dict()
+
+        # Only new jobs count against the queue; identical ones still join above
+        if self.stopping or self.queue.full():
+            shared = await self.store.find_active(job) if self.store is not None else None
+            if shared is not None:
+                self.coalesced += 1
+                return shared
+            self.rejected += 1
+            raise QueueFull()
+
+        if self.store is not None:
+            try:
+                shared = await self.store.claim(job)
+            except QueueFull:
+                self.rejected += 1
+                raise
+            if shared is not None:
+                self.coalesced += 1
+                return shared
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Filled up while the job was being registered
+            self.rejected += 1
+            if self.store is not None:
+                await self.store.discard(job)
+            raise QueueFull()
+        self.jobs[job.id] = job
+        self.in_flight[job.key] = job
+        self.submitted += 1
+        return job.to_dict()
+
+    async def get(self, job_id):
+        """The public form of a job, from this worker or the shared store"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        if self.store is not None:
+            return await self.store.get(job_id)
+        return None
+
+    async def _save(self, job):
+        if self.store is None:
+            return
+        try:
+            await self.store.update(job)
+        except Exception:
+            # The job still runs and this worker still answers for it
+            logger.warning("Could not store report job state", exc_info=True, extra={"job_id": job.id})
+
+    async def _worker(self):
+        from routes.reports import create_report
+
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.monotonic()
+            self.wait_times.append(job.started_at - job.queued_at)
+            self.running += 1
+            try:
+                await self._save(job)
+                job.result = await create_report(self.app, job.user_id, job.start, job.end, job.report_format)
+                job.status = "succeeded"
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = {"status_code": 503, "detail": "Report job was cancelled while the server stopped"}
+                raise
+            except HTTPException as e:
+                job.status = "failed"
+                job.error = {"status_code": e.status_code, "detail": e.detail}
+                self.failed += 1
+            except Exception as e:
+                job.status = "failed"
+                job.error = {"status_code": 500, "detail": f"Error generating report: {str(e)}"}
+                self.failed += 1
+            finally:
+                job.finished_at = time.monotonic()
+                self.running -= 1
+                if self.in_flight.get(job.key) is job:
+                    del self.in_flight[job.key]
+                self.queue.task_done()
+                await self._save(job)
+
+    def _expire_jobs(self):
+        cutoff = time.monotonic() - self.ttl
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def stats(self):
+        wait_times = sorted(self.wait_times)
+        return {
+            "backend": type(self.store).__name__ if self.store is not None else "memory",
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize(),
+            "queue_capacity": self.queue.maxsize,
+            "running": self.running,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(wait_times[len(wait_times) // 2] * 1000, 1) if wait_times else None,
+            "wait_ms_p95": round(wait_times[int(len(wait_times) * 0.95)] * 1000, 1) if wait_times else None,
+            "wait_ms_max": round(wait_times[-1] * 1000, 1) if wait_times else None,
+            "llm_concurrency": self.llm_concurrency,
+            "llm_active": self.llm_active,
+            "llm_waiting": self.llm_waiting
+        }
+
+
+async def create_report_job_manager(app):
+    """Build the job manager with the job store selected by REPORT_JOB_BACKEND"""
+    if REPORT_JOB_BACKEND == "mongo":
+        store = MongoJobStore(app.database.get_collection(REPORT_JOBS_COLLECTION))
+        await store.create_indexes()
+    elif REPORT_JOB_BACKEND == "memory":
+        store = None
+    else:
+        raise ValueError(f"Unknown REPORT_JOB_BACKEND: {REPORT_JOB_BACKEND}")
+    return ReportJobManager(app, store=store)
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+from pymongo import DESCENDING
+import os
+
+from symptom_storage import SYMPTOMS_COLLECTION
+from utils import as_stored_datetime
+
+REPORTS_COLLECTION = "reports"
+
+# Generated reports are kept this long for history and as bases for updates
+REPORT_HISTORY_DAYS = int(os.getenv("REPORT_HISTORY_DAYS", 180))
+
+# An earlier report is updated instead of rewritten when it covers at least
+# this share of the requested range; after REPORT_INCREMENTAL_MAX_CHAIN
+# updates in a row the report is written from scratch again
+REPORT_INCREMENTAL = os.getenv("REPORT_INCREMENTAL", "true").lower() != "false"
+REPORT_INCREMENTAL_MIN_COVERAGE = float(os.getenv("REPORT_INCREMENTAL_MIN_COVERAGE", 0.7))
+REPORT_INCREMENTAL_MAX_CHAIN = int(os.getenv("REPORT_INCREMENTAL_MAX_CHAIN", 7))
+
+
+async def save_report(database, user_id, report_format, start, end, generated_at, generated_report,
+                      medication_data, symptoms_count, chain=0):
+    """
+    Persist a generated report. generated_at is taken before its data was
+    read, on the clock of the symptoms' updated_at, so later writes into the
+    covered range can be detected.
+    """
+    await database.get_collection(REPORTS_COLLECTION).insert_one({
+        "user_id": user_id,
+        "report_format": report_format,
+        "start": as_stored_datetime(start),
+        "end": as_stored_datetime(end),
+        "generated_at": generated_at,
+        "generated_report": generated_report,
+        "medication_data": medication_data,
+        "symptoms_count": symptoms_count,
+        "chain": chain,
+        "expires_at": datetime.now(timezone.utc) + timedelta(days=REPORT_HISTORY_DAYS)
+    })
+
+
+def coverage(report, start, end):
+    """Share of [start, end] that a report's period covers"""
+    overlap = min(report["end"], end) - max(report["start"], start)
+    return max(overlap / (end - start), 0) if end > start else 0
+
+
+async def find_base_report(database, user_id, report_format, start, end):
+    """
+    The latest report of this format that an update can start from: it ends
+    within [start, end], covers enough of the range, and no symptom in the
+    part it covers was written after it was generated.
+    """
+    if not REPORT_INCREMENTAL:
+        return None
+    start, end = as_stored_datetime(start), as_stored_datetime(end)
+
+    report = await database.get_collection(REPORTS_COLLECTION).find_one(
+        {"user_id": user_id, "report_format": report_format, "end": {"$gt": start, "$lte": end}},
+        sort=[("end", DESCENDING)]
+    )
+    if report is None or report["start"] > start or report["chain"] >= REPORT_INCREMENTAL_MAX_CHAIN:
+        return None
+    if coverage(report, start, end) < REPORT_INCREMENTAL_MIN_COVERAGE:
+        return None
+
+    # Imports with old timestamps land inside the covered range; those need a full rewrite
+    changed = await database.get_collection(SYMPTOMS_COLLECTION).find_one({
+        "user_id": user_id,
+        "updated_at": {"$gt": report["generated_at"]},
+        "timestamp": {"$gte": start, "$lte": report["end"]}
+    }, {"_id": 1})
+    return None if changed else report
+
+
+async def list_reports(database, user_id, limit):
+    """A user's persisted reports, newest first"""
+    return await database.get_collection(REPORTS_COLLECTION).find(
+        {"user_id": user_id},
+        {"medication_data": 0, "expires_at": 0, "generated_at": 0}
+    ).sort("_id", DESCENDING).limit(limit).to_list(length=None)
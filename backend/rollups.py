@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+import argparse
+import asyncio
+
+from symptom_storage import SYMPTOMS_COLLECTION
+from utils import as_stored_datetime
+
+ROLLUPS_COLLECTION = "symptom_daily_rollups"
+
+
+def day_start(value: datetime):
+    """Midnight of the day a timestamp falls on"""
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def period_start(day: datetime, bucket: str):
+    """First day of the day/week/month bucket a day belongs to"""
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def update_rollups(database, symptoms):
+    """Fold newly inserted symptom documents into their users' daily rollups"""
+    increments = defaultdict(lambda: {"count": 0, "severity_sum": 0, "min": None, "max": None, "histogram": defaultdict(int)})
+    for symptom in symptoms:
+        day = day_start(as_stored_datetime(symptom["timestamp"]))
+        rollup = increments[(symptom["user_id"], day)]
+        severity = symptom["severity"]
+        rollup["count"] += 1
+        rollup["severity_sum"] += severity
+        rollup["min"] = severity if rollup["min"] is None else min(rollup["min"], severity)
+        rollup["max"] = severity if rollup["max"] is None else max(rollup["max"], severity)
+        rollup["histogram"][str(severity)] += 1
+
+    if not increments:
+        return
+
+    operations = []
+    for (user_id, day), rollup in increments.items():
+        inc = {"count": rollup["count"], "severity_sum": rollup["severity_sum"]}
+        for severity, count in rollup["histogram"].items():
+            inc[f"histogram.{severity}"] = count
+        operations.append(UpdateOne(
+            {"user_id": user_id, "day": day},
+            {"$inc": inc, "$min": {"min_severity": rollup["min"]}, "$max": {"max_severity": rollup["max"]}},
+            upsert=True
+        ))
+    await database.get_collection(ROLLUPS_COLLECTION).bulk_write(operations, ordered=False)
+
+
+async def rebuild_rollups(database, user_id=None):
+    """Recompute rollups from the raw symptoms, for one user or everyone"""
+    match = {"user_id": user_id} if user_id else {}
+    await database.get_collection(ROLLUPS_COLLECTION).delete_many(match)
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "user_id": "$user_id",
+                "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}},
+                "severity": "$severity"
+            },
+            "count": {"$sum": 1}
+        }},
+        {"$group": {
+            "_id": {"user_id": "$_id.user_id", "day": "$_id.day"},
+            "count": {"$sum": "$count"},
+            "severity_sum": {"$sum": {"$multiply": ["$_id.severity", "$count"]}},
+            "min_severity": {"$min": "$_id.severity"},
+            "max_severity": {"$max": "$_id.severity"},
+            "histogram": {"$push": {"k": {"$toString": "$_id.severity"}, "v": "$count"}}
+        }},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id.user_id",
+            "day": "$_id.day",
+            "count": 1,
+            "severity_sum": 1,
+            "min_severity": 1,
+            "max_severity": 1,
+            "histogram": {"$arrayToObject": "$histogram"}
+        }},
+        {"$merge": {"into": ROLLUPS_COLLECTION, "on": ["user_id", "day"], "whenMatched": "replace"}}
+    ]
+    cursor = await database.get_collection(SYMPTOMS_COLLECTION).aggregate(pipeline, allowDiskUse=True)
+    await cursor.to_list(length=None)
+
+
+def summarize_rollups(rollups):
+    """Combine rollup documents into count, min/max/mean severity and histogram"""
+    count = sum(rollup["count"] for rollup in rollups)
+    histogram = defaultdict(int)
+    for rollup in rollups:
+        for severity, severity_count in rollup.get("histogram", {}).items():
+            histogram[severity] += severity_count
+    return {
+        "count": count,
+        "mean_severity": round(sum(rollup["severity_sum"] for rollup in rollups) / count, 2) if count else None,
+        "min_severity": min((rollup["min_severity"] for rollup in rollups), default=None),
+        "max_severity": max((rollup["max_severity"] for rollup in rollups), default=None),
+        "histogram": dict(sorted(histogram.items(), key=lambda item: int(item[0])))
+    }
+
+
+async def symptom_stats(database, user_id, start, end, bucket="day"):
+    """Severity trends over a range of whole days, answered from the rollups"""
+    rollups = await database.get_collection(ROLLUPS_COLLECTION).find(
+        {"user_id": user_id, "day": {"$gte": day_start(as_stored_datetime(start)), "$lte": day_start(as_stored_datetime(end))}}
+    ).sort("day", 1).to_list(length=None)
+
+    periods = defaultdict(list)
+    for rollup in rollups:
+        periods[period_start(rollup["day"], bucket)].append(rollup)
+
+    series = []
+    for period, period_rollups in periods.items():
+        series.append({"period": period.date().isoformat(), **summarize_rollups(period_rollups)})
+
+    return {"totals": summarize_rollups(rollups), "series": series}
+
+
+async def main(user_id):
+    from database import connect_database, close_database
+
+    mongodb_client, database = connect_database()
+    try:
+        await rebuild_rollups(database, user_id)
+    finally:
+        await close_database(mongodb_client)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily symptom rollups from raw symptoms")
+    parser.add_argument("--user-id", help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.user_id))
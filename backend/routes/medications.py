@@ -1,15 +1,21 @@
 from fastapi import APIRouter, HTTPException, Body, Path, Query, Request
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from models import MedicationModel, MedicationCreate, MedicationUpdate
-from utils import validate_object_id
+from delta_sync import record_tombstone
+from utils import FastJSONResponse, as_stored_datetime, fetch_keyset_page, stored_now, validate_object_id
+from versions import bump_user_version, etag_headers, etag_matches, not_modified, user_etag
 
 router = APIRouter()
 
+# Fields returned by the read endpoints
+MEDICATION_PROJECTION = {"name": 1, "dosage": 1, "frequency": 1, "user_id": 1, "created_at": 1, "updated_at": 1}
+
 @router.post("/", response_description="Add new medication")
-def create_medication(request: Request, user_id: str, medication: MedicationCreate = Body(...)):
+async def create_medication(request: Request, user_id: str, medication: MedicationCreate = Body(...)):
     """Add a new medication for a specific user"""
     if not validate_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid user ID")
@@ -18,35 +24,58 @@ def create_medication(request: Request, user_id: str, medication: MedicationCrea
     medication_data["user_id"] = user_id
     utc_now = datetime.now(timezone.utc)
     gst_now = utc_now + timedelta(hours=4)
-    medication_data["created_at"] = gst_now
-    medication_data["updated_at"] = gst_now
+    medication_data["created_at"] = as_stored_datetime(gst_now)
+    medication_data["updated_at"] = as_stored_datetime(gst_now)
     
+    # insert_one sets _id on medication_data, so it doubles as the response
     medications_collection = request.app.database.get_collection("medications")
-    new_medication = medications_collection.insert_one(medication_data)
-    created_medication = medications_collection.find_one({"_id": new_medication.inserted_id})
+    await medications_collection.insert_one(medication_data)
+    # Versioned before the side effects, so a failure in them cannot leave stale ETags
+    await bump_user_version(request.app.database, user_id)
+    await request.app.report_cache.invalidate_user(user_id)
     
     # Convert ObjectId to string
-    created_medication["_id"] = str(created_medication["_id"])
+    medication_data["_id"] = str(medication_data["_id"])
     
-    return created_medication
+    return medication_data
 
 @router.get("/{user_id}", response_description="List all medications for a user")
-def list_medications(request: Request, user_id: str, skip: int = 0, limit: int = 100):
-    """Get all medications for a specific user"""
+async def list_medications(
+    request: Request,
+    user_id: str,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None
+):
+    """
+    Get all medications for a specific user.
+    Passing cursor (empty for the first page) switches to keyset pagination
+    ordered by _id and returns {"items", "next_cursor"}.
+    Answers If-None-Match with 304 while the user's data is unchanged.
+    """
     if not validate_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
+    etag = await user_etag(request, user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     medications_collection = request.app.database.get_collection("medications")
-    medications = list(medications_collection.find({"user_id": user_id}).skip(skip).limit(limit))
     
-    # Convert ObjectId to string for each medication
-    for medication in medications:
-        medication["_id"] = str(medication["_id"])
+    if cursor is not None:
+        return FastJSONResponse(await fetch_keyset_page(
+            medications_collection, {"user_id": user_id}, ["_id"], cursor, limit, MEDICATION_PROJECTION
+        ), headers=etag_headers(etag))
+    
+    medications = await medications_collection.find(
+        {"user_id": user_id}, MEDICATION_PROJECTION
+    ).skip(skip).limit(limit).to_list(length=None)
     
-    return medications
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse(medications, headers=etag_headers(etag))
 
 @router.put("/{medication_id}", response_description="Update a medication")
-def update_medication(
+async def update_medication(
     request: Request,
     medication_id: str, 
     user_id: str,
@@ -62,26 +91,23 @@ def update_medication(
     if not update_data:
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    # Add updated timestamp
-    update_data["updated_at"] = datetime.now()
+    # Add updated timestamp, on the same clock as created_at so sync can order by it
+    update_data["updated_at"] = stored_now()
     
     medications_collection = request.app.database.get_collection("medications")
     
-    # Ensure the medication belongs to the user
-    medication_exists = medications_collection.find_one({
-        "_id": ObjectId(medication_id),
-        "user_id": user_id
-    })
+    # The user_id in the filter ensures the medication belongs to the user
+    updated_medication = await medications_collection.find_one_and_update(
+        {"_id": ObjectId(medication_id), "user_id": user_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
     
-    if not medication_exists:
+    if not updated_medication:
         raise HTTPException(status_code=404, detail="Medication not found or does not belong to user")
     
-    medications_collection.update_one(
-        {"_id": ObjectId(medication_id)}, 
-        {"$set": update_data}
-    )
-    
-    updated_medication = medications_collection.find_one({"_id": ObjectId(medication_id)})
+    await bump_user_version(request.app.database, user_id)
+    await request.app.report_cache.invalidate_user(user_id)
     
     # Convert ObjectId to string
     updated_medication["_id"] = str(updated_medication["_id"])
@@ -89,15 +115,15 @@ def update_medication(
     return updated_medication
 
 @router.delete("/{medication_id}", response_description="Delete a medication")
-def delete_medication(request: Request, medication_id: str, user_id: str):
+async def delete_medication(request: Request, medication_id: str, user_id: str):
     """Delete a medication for a specific user"""
     if not validate_object_id(medication_id) or not validate_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
     medications_collection = request.app.database.get_collection("medications")
     
-    # Ensure the medication belongs to the user
-    medication = medications_collection.find_one({
+    # The user_id in the filter ensures the medication belongs to the user
+    medication = await medications_collection.find_one_and_delete({
         "_id": ObjectId(medication_id),
         "user_id": user_id
     })
@@ -105,9 +131,8 @@ def delete_medication(request: Request, medication_id: str, user_id: str):
     if not medication:
         raise HTTPException(status_code=404, detail="Medication not found or does not belong to user")
     
-    delete_result = medications_collection.delete_one({"_id": ObjectId(medication_id)})
-    
-    if delete_result.deleted_count == 1:
-        return {"message": "Medication deleted successfully"}
-    
-    raise HTTPException(status_code=500, detail="Failed to delete medication")
+    await bump_user_version(request.app.database, user_id)
+    # Deletes are hard, so sync clients learn about them from a tombstone
+    await record_tombstone(request.app.database, user_id, "medications", medication["_id"])
+    await request.app.report_cache.invalidate_user(user_id)
+    return {"message": "Medication deleted successfully"}
@@ -1,59 +1,91 @@
 from fastapi import APIRouter, HTTPException, Query, Path, Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 from typing import Optional
 from datetime import datetime, timedelta
 from bson import ObjectId
+import asyncio
+import json
+import logging
 import os
-from groq import Groq
+import time
+from starlette.concurrency import run_in_threadpool
 
+from fast_report import FAST_REPORT_FORMAT, build_fast_report
+from metrics import LLM_FIRST_TOKEN, REPORT_FALLBACKS, REPORT_GENERATIONS, record_llm_usage, track_llm_call
 from models import ReportQuery
-from utils import parse_date_range, validate_object_id
+from pdf_render import pdf_cache_key, pdf_render_stats, render_pdf
+from prompts import (
+    PROMPT_TOKEN_BUDGET, SYMPTOMS_HEADER, SYSTEM_PROMPT, build_incremental_messages, build_report_messages,
+    build_summary_messages, encode_medications, encode_symptom_days, encode_symptoms, estimate_tokens, fit_blocks,
+    pack_blocks
+)
+from report_cache import report_cache_key
+from report_jobs import QueueFull
+from report_store import find_base_report, list_reports, save_report
+from symptom_storage import SYMPTOMS_COLLECTION
+from utils import FastJSONResponse, parse_date_range, stored_now, validate_object_id
 
 router = APIRouter()
 
-@router.get("/{user_id}", response_description="Generate report for a user")
-def generate_report(
-    request: Request,
-    user_id: str,
-    start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None,
-    report_format: str = "summary"
-):
-    """
-    Fetch data for a given date range and generate a report using Groq API.
-    If no date range is specified, it uses the last 30 days.
-    """
-    if not validate_object_id(user_id):
-        raise HTTPException(status_code=400, detail="Invalid user ID")
-    
-    # Parse date range or use defaults
-    start, end = parse_date_range(start_date, end_date)
-    
+logger = logging.getLogger(__name__)
+
+REPORT_MODEL = "llama-3.3-70b-versatile"
+
+# Summarization rounds before the final call when the data exceeds the budget
+MAP_REDUCE_MAX_ROUNDS = 3
+
+# Seconds an LLM report may take before the local report is served instead;
+# 0 waits indefinitely. REPORT_FALLBACK=false returns 500 on LLM errors instead.
+REPORT_LLM_DEADLINE = float(os.getenv("REPORT_LLM_DEADLINE", 20))
+REPORT_FALLBACK = os.getenv("REPORT_FALLBACK", "true").lower() != "false"
+
+@router.get("/cache/stats", response_description="Report cache statistics")
+async def report_cache_stats(request: Request):
+    """Get hit/miss counters for the report cache"""
+    return await request.app.report_cache.stats()
+
+@router.get("/pdf/stats", response_description="PDF render statistics")
+async def report_pdf_stats(request: Request):
+    """Get PDF cache counters and render times"""
+    return {**await request.app.pdf_cache.stats(), **pdf_render_stats()}
+
+@router.get("/admission/stats", response_description="Admission control statistics")
+async def report_admission_stats(request: Request):
+    """Get concurrency, queue and shed counters of report admission control"""
+    return request.app.admission.stats()
+
+@router.get("/jobs/stats", response_description="Report job queue statistics")
+async def report_job_stats(request: Request):
+    """Get queue depth, wait times and LLM concurrency of report jobs"""
+    return request.app.report_jobs.stats()
+
+async def fetch_report_data(database, user_id: str, start: datetime, end: datetime):
+    """Load the symptoms and medications a report is generated from"""
     # Query symptoms for the user within the date range
-    symptoms_collection = request.app.database.get_collection("symptoms")
-    medications_collection = request.app.database.get_collection("medications")
+    symptoms_collection = database.get_collection(SYMPTOMS_COLLECTION)
+    medications_collection = database.get_collection("medications")
     
     symptoms_query = {
         "user_id": user_id,
         "timestamp": {"$gte": start, "$lte": end}
     }
     
-    symptoms = list(symptoms_collection.find(symptoms_query))
-    medications = list(medications_collection.find({"user_id": user_id}))
+    symptoms = await symptoms_collection.find(
+        symptoms_query, {"_id": 0, "name": 1, "details": 1, "severity": 1, "timestamp": 1}
+    ).sort("timestamp", 1).to_list(length=None)
+    medications = await medications_collection.find(
+        {"user_id": user_id}, {"_id": 0, "name": 1, "dosage": 1, "frequency": 1, "created_at": 1}
+    ).to_list(length=None)
 
     # if symptom and medication data is empty, raise an error and return 404
     if not symptoms:
         raise HTTPException(status_code=404, detail="No data found for the specified user and date range")
     
-    # Convert ObjectIds to strings
-    for symptom in symptoms:
-        symptom["_id"] = str(symptom["_id"])
-    
-    for medication in medications:
-        medication["_id"] = str(medication["_id"])
-    
     # Prepare data for the report
     symptom_data = [
         {
+            "name": s.get("name", ""),
             "details": s["details"],
             "severity": s["severity"],
             "timestamp": s["timestamp"].isoformat() if isinstance(s["timestamp"], datetime) else s["timestamp"]
@@ -68,133 +100,406 @@ def generate_report(
         } for m in medications
     ]
     
-    # Initialize Groq client
-    try:
-        groq_api_key = os.environ.get("GROQ_API_KEY")
-        if not groq_api_key:
-            raise HTTPException(status_code=500, detail="GROQ_API_KEY not found in environment variables")
-        
-        client = Groq(api_key=groq_api_key)
-        
-        system_prompt = """You are a medical report generator that creates professionally formatted health timelines compatible with PDFMake. Generate a comprehensive health timeline based on the provided symptoms and medications data.
-        The timeline must include:
-        1. A title page with patient information and report period
-        2. A chronological list of symptoms with their dates and severity
-        3. A chronological list of medications with their start and end dates, and purposes
-        4. Analysis of potential correlations between medications and symptom changes
-        5. Recommendations for follow-up (without specific medical advice)
-
-        FORMATTING REQUIREMENTS:
-        - Use consistent heading levels: # for main sections, ## for subsections
-        - Format dates as MM/DD/YYYY for better readability
-        - Use **bold** for important information (dates, medication names, symptom names)
-        - Use *italics* for severity levels and medication dosages
-        - Use bullet points (•) for listing items within sections
-        - Include horizontal rules (---) between major sections
-        - Create tables using markdown format for medication schedules
-        - Keep paragraphs short and concise for better PDF rendering
-        - Use clear section headers with proper hierarchical structure
-        - Include a summary section at the beginning
-
-        The output should be in markdown format that can be easily converted to PDFMake-compatible structure."""
-
-        user_content = f"""
-        Generate a detailed, professionally formatted health report timeline for the period from **{start.strftime('%B %d, %Y')}** to **{end.strftime('%B %d, %Y')}**.
-
-        # SYMPTOMS DATA:
-        {symptom_data}
-
-        # MEDICATIONS DATA:
-        {medication_data}
-
-        Report format requested: {report_format}
-
-        Ensure the report uses proper hierarchical headings, bold for important information, italics for supporting details, and maintains a consistent formatting style throughout. Include clear section dividers and organize information in a logical flow that will render well in a PDF document.
-        """
-        
-        # Call Groq API
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_content
-                }
-            ],
-            model="llama-3.3-70b-versatile",
+    return symptoms, medications, symptom_data, medication_data
+
+def build_cache_key(start, end, symptom_data, medication_data, report_format):
+    """Cache key covering everything that goes into the report prompt"""
+    return report_cache_key(
+        system_prompt=SYSTEM_PROMPT,
+        model=REPORT_MODEL,
+        prompt_budget=PROMPT_TOKEN_BUDGET,
+        report_format=report_format,
+        start=start.date().isoformat(),
+        end=end.date().isoformat(),
+        symptom_data=symptom_data,
+        medication_data=medication_data
+    )
+
+def get_llm_client(app):
+    """The shared LLM client; GROQ_BASE_URL or LLM_BACKEND=fake point it at a local fake"""
+    if not app.llm.available():
+        raise HTTPException(status_code=500, detail="GROQ_API_KEY not found in environment variables")
+    
+    return app.llm
+
+def build_report(user_id, start, end, symptoms, medications, generated_report, engine="llm"):
+    """Assemble the report response; engine is "llm" or "local" """
+    return {
+        "user_id": user_id,
+        "report_engine": engine,
+        "report_period": {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat()
+        },
+        "generated_report": generated_report,
+        "data_summary": {
+            "symptoms_count": len(symptoms),
+            "medications_count": len(medications)
+        }
+    }
+
+async def summarize_chunk(app, client, chunk):
+    """Condense a run of day blocks into one summary block (the map step)"""
+    first_day, last_day = chunk[0][0], chunk[-1][1]
+    text = "\n".join(block[2] for block in chunk)
+    async with app.report_jobs.llm_slot():
+        with track_llm_call("summary"):
+            chat_completion = await client.chat.completions.create(
+                messages=build_summary_messages(first_day, last_day, text),
+                model=REPORT_MODEL,
+            )
+    record_llm_usage("summary", chat_completion.usage)
+    summary = chat_completion.choices[0].message.content
+    return first_day, last_day, f"{first_day} to {last_day}:\n{summary}"
+
+async def prepare_report_messages(app, client, start, end, symptom_data, medication_data, report_format):
+    """
+    Build the final report prompt within PROMPT_TOKEN_BUDGET. Medications
+    take up to half of it; when the encoded symptoms exceed the rest, chunks
+    of days are summarized in parallel first and the report is written from
+    the summaries. Whatever still does not fit after MAP_REDUCE_MAX_ROUNDS
+    is cut, oldest days first.
+    """
+    medications_text = encode_medications(medication_data, PROMPT_TOKEN_BUDGET // 2)
+    budget = PROMPT_TOKEN_BUDGET - estimate_tokens(medications_text) - estimate_tokens(SYMPTOMS_HEADER)
+    
+    blocks = encode_symptom_days(symptom_data)
+    summarized = False
+    for _ in range(MAP_REDUCE_MAX_ROUNDS):
+        if len(blocks) < 2 or sum(estimate_tokens(block[2]) for block in blocks) <= budget:
+            break
+        chunks = pack_blocks(blocks, budget)
+        blocks = await asyncio.gather(*(summarize_chunk(app, client, chunk) for chunk in chunks))
+        summarized = True
+    
+    fitted = fit_blocks(blocks, budget)
+    if fitted is not blocks:
+        logger.warning("Report data cut to fit the prompt budget", extra={"budget": PROMPT_TOKEN_BUDGET})
+        blocks = fitted
+    
+    if summarized:
+        symptoms_text = "\n\n".join(block[2] for block in blocks)
+    else:
+        symptoms_text = "\n".join([SYMPTOMS_HEADER] + [block[2] for block in blocks])
+    
+    return build_report_messages(start, end, symptoms_text, medications_text, report_format, summarized)
+
+def prepare_incremental_messages(base, start, end, symptoms, symptom_data, medication_data, report_format):
+    """
+    Build a prompt updating the base report with only the symptoms logged
+    after it, or None when they do not fit the token budget
+    """
+    new_symptoms = [data for symptom, data in zip(symptoms, symptom_data) if symptom["timestamp"] > base["end"]]
+    symptoms_text = encode_symptoms(new_symptoms) if new_symptoms else "No new symptom entries."
+    medications_text = None if medication_data == base["medication_data"] else encode_medications(medication_data)
+    if estimate_tokens(symptoms_text) + estimate_tokens(medications_text or "") > PROMPT_TOKEN_BUDGET:
+        return None
+    
+    return build_incremental_messages(
+        base["generated_report"], base["start"], base["end"], start, end, symptoms_text, medications_text, report_format
+    )
+
+async def generate_llm_report(app, user_id, start, end, symptoms, symptom_data, medication_data, report_format,
+                              generated_at, refresh=False):
+    """
+    Write the report with the LLM and persist it. When an earlier report
+    covers most of the range, it is updated with the newer symptoms instead;
+    otherwise the data is summarized first if it is too large.
+    """
+    client = get_llm_client(app)
+    
+    base = None if refresh else await find_base_report(app.database, user_id, report_format, start, end)
+    messages = None
+    if base is not None:
+        messages = prepare_incremental_messages(base, start, end, symptoms, symptom_data, medication_data, report_format)
+    mode = "full" if messages is None else "incremental"
+    if messages is None:
+        messages = await prepare_report_messages(
+            app, client, start, end, symptom_data, medication_data, report_format
         )
+    
+    # Call Groq API
+    operation = "report" if mode == "full" else "report_update"
+    async with app.report_jobs.llm_slot():
+        with track_llm_call(operation):
+            chat_completion = await client.chat.completions.create(
+                messages=messages,
+                model=REPORT_MODEL,
+            )
+    record_llm_usage(operation, chat_completion.usage)
+    REPORT_GENERATIONS.inc(mode)
+    
+    # Extract the generated report
+    generated_report = chat_completion.choices[0].message.content
+    chain = base["chain"] + 1 if mode == "incremental" else 0
+    await save_report(
+        app.database, user_id, report_format, start, end, generated_at, generated_report,
+        medication_data, len(symptoms), chain
+    )
+    return generated_report
+
+async def create_report(app, user_id, start, end, report_format, refresh=False):
+    """
+    Generate a report for a resolved date range, shared by the endpoints and
+    report jobs. report_format="fast" builds it locally without the LLM, as
+    does an LLM call that fails or passes REPORT_LLM_DEADLINE.
+    """
+    # Taken before the read, so writes racing with it count as newer than the report
+    generated_at = stored_now()
+    symptoms, medications, symptom_data, medication_data = await fetch_report_data(app.database, user_id, start, end)
+    
+    if report_format == FAST_REPORT_FORMAT:
+        generated_report = build_fast_report(start, end, symptoms, medications)
+        return build_report(user_id, start, end, symptoms, medications, generated_report, engine="local")
+    
+    # Serve an identical report from the cache instead of calling Groq again
+    report_cache = app.report_cache
+    cache_key = build_cache_key(start, end, symptom_data, medication_data, report_format)
+    generated_report = None if refresh else await report_cache.get(cache_key)
+    
+    if generated_report is None:
+        try:
+            generated_report = await asyncio.wait_for(
+                generate_llm_report(
+                    app, user_id, start, end, symptoms, symptom_data, medication_data, report_format, generated_at, refresh
+                ),
+                REPORT_LLM_DEADLINE or None
+            )
+        except Exception as e:
+            if not REPORT_FALLBACK:
+                logger.exception("Report generation failed", extra={"user_id": user_id})
+                raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+            
+            # Fallback reports are not cached, so the next request tries the LLM again
+            reason = "deadline" if isinstance(e, asyncio.TimeoutError) else "error"
+            REPORT_FALLBACKS.inc(reason)
+            logger.warning("Serving the local report instead of the LLM report",
+                           extra={"user_id": user_id, "reason": reason, "error": str(e)})
+            generated_report = build_fast_report(start, end, symptoms, medications)
+            return build_report(user_id, start, end, symptoms, medications, generated_report, engine="local")
         
-        # Extract the generated report
-        generated_report = chat_completion.choices[0].message.content
+        await report_cache.set(cache_key, user_id, generated_report)
+    
+    return build_report(user_id, start, end, symptoms, medications, generated_report)
+
+@router.get("/{user_id}", response_description="Generate report for a user")
+async def generate_report(
+    request: Request,
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    report_format: str = "summary",
+    refresh: bool = False
+):
+    """
+    Fetch data for a given date range and generate a report using Groq API.
+    If no date range is specified, it uses the last 30 days.
+    Identical reports are served from the report cache unless refresh is set.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    # Parse date range or use defaults
+    start, end = parse_date_range(start_date, end_date)
+    
+    async with request.app.admission.admit(user_id):
+        return await create_report(request.app, user_id, start, end, report_format, refresh)
+
+@router.get("/{user_id}/history", response_description="List a user's generated reports")
+async def get_report_history(request: Request, user_id: str, limit: int = Query(10, ge=1, le=100)):
+    """Get the reports generated for a user, newest first"""
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    reports = await list_reports(request.app.database, user_id, limit)
+    
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse(reports)
+
+@router.post("/{user_id}/jobs", status_code=202, response_description="Queue report generation for a user")
+async def create_report_job(
+    request: Request,
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    report_format: str = "summary"
+):
+    """
+    Queue a report for background generation and return its job id.
+    An identical request that is still queued or running returns the same job.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    # Parse date range or use defaults
+    start, end = parse_date_range(start_date, end_date)
+    
+    # Jobs wait in their own bounded queue, so only the rate limits apply here
+    await request.app.admission.check_rate(user_id)
+    try:
+        job = await request.app.report_jobs.submit(user_id, start, end, report_format)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Report queue is full", headers={"Retry-After": "5"})
+    
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+@router.get("/{user_id}/jobs/{job_id}", response_description="Get a report job")
+async def get_report_job(request: Request, user_id: str, job_id: str):
+    """Get the status of a report job and, once finished, its result"""
+    job = await request.app.report_jobs.get(job_id)
+    
+    if not job or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail=f"Report job {job_id} not found")
+    
+    return job
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/{user_id}/stream", response_description="Stream a generated report for a user")
+async def stream_report(
+    request: Request,
+    user_id: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    report_format: str = "summary"
+):
+    """
+    Generate a report like generate_report, forwarding tokens as Server-Sent
+    Events while Groq produces them. "token" events carry text fragments and a
+    final "done" event carries report_period and data_summary.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    # Parse date range or use defaults
+    start, end = parse_date_range(start_date, end_date)
+    
+    # The concurrency slot is held until the stream ends, so it is released
+    # by whichever runs first: the generator's finally or the background task
+    admission = request.app.admission
+    await admission.check_rate(user_id)
+    await admission.acquire()
+    released = False
+    
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+    
+    # Errors up to here are returned as regular HTTP errors
+    try:
+        symptoms, medications, symptom_data, medication_data = await fetch_report_data(request.app.database, user_id, start, end)
         
-        return {
-            "user_id": user_id,
-            "report_period": {
-                "start_date": start.isoformat(),
-                "end_date": end.isoformat()
-            },
-            "generated_report": generated_report,
-            "data_summary": {
-                "symptoms_count": len(symptoms),
-                "medications_count": len(medications)
-            }
-        }
+        report_cache = request.app.report_cache
+        cache_key = build_cache_key(start, end, symptom_data, medication_data, report_format)
+        if report_format == FAST_REPORT_FORMAT:
+            # The local report is built in one piece, so it goes out as a single token
+            cached_report = build_fast_report(start, end, symptoms, medications)
+        else:
+            cached_report = await report_cache.get(cache_key)
+        client = None if cached_report is not None else get_llm_client(request.app)
+    except BaseException:
+        release()
+        raise
+    
+    async def events():
+        try:
+            async for event in report_events():
+                yield event
+        finally:
+            release()
+    
+    async def report_events():
+        if cached_report is not None:
+            yield sse_event("token", cached_report)
+        else:
+            try:
+                parts = []
+                messages = await prepare_report_messages(
+                    request.app, client, start, end, symptom_data, medication_data, report_format
+                )
+                async with request.app.report_jobs.llm_slot():
+                    with track_llm_call("stream"):
+                        started = time.perf_counter()
+                        stream = await client.chat.completions.create(
+                            messages=messages,
+                            model=REPORT_MODEL,
+                            stream=True,
+                        )
+                        async for chunk in stream:
+                            token = chunk.choices[0].delta.content if chunk.choices else None
+                            if token:
+                                if not parts:
+                                    LLM_FIRST_TOKEN.observe(time.perf_counter() - started, "stream")
+                                parts.append(token)
+                                yield sse_event("token", token)
+                            # Groq reports usage on the last chunk of a stream
+                            x_groq = getattr(chunk, "x_groq", None)
+                            record_llm_usage("stream", getattr(x_groq, "usage", None))
+            except Exception as e:
+                logger.exception("Report stream failed", extra={"user_id": user_id})
+                yield sse_event("error", {"detail": f"Error generating report: {str(e)}"})
+                return
+            await report_cache.set(cache_key, user_id, "".join(parts))
         
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+        engine = "local" if report_format == FAST_REPORT_FORMAT else "llm"
+        report = build_report(user_id, start, end, symptoms, medications, None, engine)
+        del report["generated_report"]
+        yield sse_event("done", report)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
 
 @router.get("/{user_id}/pdf", response_description="Generate PDF report for a user")
-def generate_pdf_report(
+async def generate_pdf_report(
     request: Request,
     user_id: str,
     start_date: Optional[datetime] = None,
-    end_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None,
+    report_format: str = "detailed"
 ):
     """
     Generate a PDF report for the user's health data within the specified date range.
+    The report text comes from the report cache when available and rendered
+    PDFs are cached by content, so repeated downloads skip both steps.
     """
-    # First get the report content using the existing endpoint
-    report_data = generate_report(request, user_id, start_date, end_date, report_format="detailed")
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
     
-    try:
-        from fpdf import FPDF
-        
-        # Create PDF
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Set up the PDF
-        pdf.set_font("Arial", "B", 16)
-        pdf.cell(190, 10, "Health Report", ln=True, align="C")
-        
-        # Add period
-        pdf.set_font("Arial", "I", 12)
-        pdf.cell(190, 10, f"Period: {report_data['report_period']['start_date']} to {report_data['report_period']['end_date']}", ln=True)
-        
-        # Add report content
-        pdf.set_font("Arial", "", 12)
-        
-        # Split the report into lines to properly format in PDF
-        report_text = report_data["generated_report"]
-        pdf.multi_cell(190, 10, report_text)
+    # Parse date range or use defaults
+    start, end = parse_date_range(start_date, end_date)
+    
+    # One admission covers both the report and the render
+    async with request.app.admission.admit(user_id):
+        report_data = await create_report(request.app, user_id, start, end, report_format)
         
-        # Generate the PDF in memory
-        pdf_output = pdf.output(dest="S").encode("latin1")
+        pdf_cache = request.app.pdf_cache
+        cache_key = pdf_cache_key(report_data)
+        pdf_output = await pdf_cache.get(cache_key)
         
-        # Create a FastAPI response with the PDF
-        from fastapi.responses import Response
-        return Response(
-            content=pdf_output,
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename=health_report_{user_id}.pdf"
-            }
-        )
-    except ImportError:
-        # If FPDF is not installed
-        raise HTTPException(status_code=500, detail="PDF generation library not available")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
+        if pdf_output is None:
+            try:
+                # Rendering is CPU-bound, so keep it off the event loop
+                pdf_output = await run_in_threadpool(render_pdf, report_data)
+            except ImportError:
+                # If FPDF is not installed
+                raise HTTPException(status_code=500, detail="PDF generation library not available")
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
+            await pdf_cache.set(cache_key, user_id, pdf_output)
+    
+    # Create a FastAPI response with the PDF
+    return Response(
+        content=pdf_output,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f"attachment; filename=health_report_{user_id}.pdf"
+        }
+    )
@@ -1,51 +1,186 @@
 from fastapi import APIRouter, HTTPException, Body, Query, Path, Request
-from typing import List
+from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import json
+import logging
+import os
+import re
 
 # Use relative imports for local modules
-from models import SymptomModel, SymptomCreate
-from utils import validate_object_id
+from models import SymptomModel, SymptomCreate, SymptomBulkCreate
+from rollups import symptom_stats, update_rollups
+from symptom_storage import SYMPTOMS_COLLECTION, USE_TIMESERIES
+from utils import FastJSONResponse, as_stored_datetime, fetch_keyset_page, parse_date_range, validate_object_id
+from versions import bump_user_version, etag_headers, etag_matches, not_modified, user_etag
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
+# Number of records written per insert_many call in the bulk endpoint
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+
+# Most recent matches a search ranks on time-series storage, which has no text index
+SEARCH_SCAN_LIMIT = int(os.getenv("SEARCH_SCAN_LIMIT", 1000))
+
+# Fields returned by the read endpoints
+SYMPTOM_PROJECTION = {"name": 1, "details": 1, "severity": 1, "user_id": 1, "timestamp": 1}
+
 @router.post("/", response_description="Add new symptom")
-def create_symptom(request: Request, user_id: str, symptom: SymptomCreate = Body(...)):
+async def create_symptom(request: Request, user_id: str, symptom: SymptomCreate = Body(...)):
     """Add a new symptom for a specific user"""
     if not validate_object_id(user_id):
-        print("user id validation failed")
+        logger.info("Rejected symptom with invalid user id", extra={"user_id": user_id})
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
-    print(symptom)
     symptom_data = symptom.dict()
     symptom_data["user_id"] = user_id
     utc_now = datetime.now(timezone.utc)
     gst_now = utc_now + timedelta(hours=4)
-    symptom_data["timestamp"] = gst_now
-    print(user_id)
+    symptom_data["timestamp"] = as_stored_datetime(gst_now)
+    symptom_data["updated_at"] = symptom_data["timestamp"]
     
-    symptoms_collection = request.app.database.get_collection("symptoms")
-    new_symptom = symptoms_collection.insert_one(symptom_data)
-    created_symptom = symptoms_collection.find_one({"_id": new_symptom.inserted_id})
+    # insert_one sets _id on symptom_data, so it doubles as the response
+    symptoms_collection = request.app.database.get_collection(SYMPTOMS_COLLECTION)
+    await symptoms_collection.insert_one(symptom_data)
+    # Versioned before the side effects, so a failure in them cannot leave stale ETags
+    await bump_user_version(request.app.database, user_id)
+    await update_rollups(request.app.database, [symptom_data])
+    await request.app.report_cache.invalidate_user(user_id)
     
     # Convert ObjectId to string for the response
-    created_symptom["_id"] = str(created_symptom["_id"])
+    symptom_data["_id"] = str(symptom_data["_id"])
+    logger.debug("Symptom created", extra={"user_id": user_id, "symptom_id": symptom_data["_id"]})
+    
+    return symptom_data
+
+async def iter_ndjson_lines(request: Request):
+    """Yield the non-empty lines of an NDJSON request body as it streams in"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+async def insert_symptom_chunk(database, user_id, documents, indexes, errors):
+    """Insert one chunk unordered, recording failed records by their request index"""
+    try:
+        await database.get_collection(SYMPTOMS_COLLECTION).insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        failed = set()
+        for write_error in e.details["writeErrors"]:
+            failed.add(write_error["index"])
+            errors.append({"index": indexes[write_error["index"]], "error": write_error["errmsg"]})
+        documents = [document for i, document in enumerate(documents) if i not in failed]
+    finally:
+        # Every chunk is versioned, even one that failed partway, before its side effects
+        await bump_user_version(database, user_id)
     
-    return created_symptom
+    await update_rollups(database, documents)
+    return len(documents)
+
+@router.post("/bulk", response_description="Add many symptoms at once")
+async def create_symptoms_bulk(request: Request, user_id: str):
+    """
+    Add symptoms for a specific user from a JSON array or an NDJSON stream
+    (Content-Type: application/x-ndjson). Invalid records are reported by
+    index without aborting the rest of the batch.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    is_ndjson = "ndjson" in request.headers.get("content-type", "")
+    if is_ndjson:
+        records = iter_ndjson_lines(request)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Request body must be a JSON array")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Request body must be a JSON array")
+        
+        async def iter_body():
+            for record in body:
+                yield record
+        records = iter_body()
+    
+    utc_now = datetime.now(timezone.utc)
+    gst_now = utc_now + timedelta(hours=4)
+    # Imported records keep their timestamp but are new to sync clients
+    updated_at = as_stored_datetime(gst_now)
+    
+    database = request.app.database
+    inserted = 0
+    errors = []
+    chunk, chunk_indexes = [], []
+    index = 0
+    
+    async for record in records:
+        try:
+            if is_ndjson:
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                raise ValueError("Record must be a JSON object")
+            symptom_data = SymptomBulkCreate(**record).dict()
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+        else:
+            symptom_data["user_id"] = user_id
+            symptom_data["timestamp"] = as_stored_datetime(symptom_data["timestamp"] or gst_now)
+            symptom_data["updated_at"] = updated_at
+            chunk.append(symptom_data)
+            chunk_indexes.append(index)
+            
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                inserted += await insert_symptom_chunk(database, user_id, chunk, chunk_indexes, errors)
+                chunk, chunk_indexes = [], []
+        index += 1
+    
+    if chunk:
+        inserted += await insert_symptom_chunk(database, user_id, chunk, chunk_indexes, errors)
+    
+    if inserted:
+        await request.app.report_cache.invalidate_user(user_id)
+    
+    errors.sort(key=lambda error: error["index"])
+    return {
+        "received": index,
+        "inserted": inserted,
+        "failed": len(errors),
+        "errors": errors
+    }
 
 @router.get("/{user_id}", response_description="List all symptoms for a user")
-def list_symptoms(
+async def list_symptoms(
     request: Request,
     user_id: str,
     skip: int = 0,
     limit: int = 100,
     start_date: datetime = None,
-    end_date: datetime = None
+    end_date: datetime = None,
+    cursor: Optional[str] = None
 ):
-    """Get all symptoms for a specific user with optional date filtering"""
+    """
+    Get all symptoms for a specific user with optional date filtering.
+    Passing cursor (empty for the first page) switches to keyset pagination
+    ordered by (timestamp, _id) and returns {"items", "next_cursor"}.
+    Answers If-None-Match with 304 while the user's data is unchanged.
+    """
     if not validate_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
+    # The version lookup is a single _id read, so unchanged data skips the query
+    etag = await user_etag(request, user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     query = {"user_id": user_id}
     
     # Add date range filtering if provided
@@ -59,11 +194,104 @@ def list_symptoms(
         if date_filter:
             query["timestamp"] = date_filter
     
-    symptoms_collection = request.app.database.get_collection("symptoms")
-    symptoms = list(symptoms_collection.find(query).skip(skip).limit(limit))
+    symptoms_collection = request.app.database.get_collection(SYMPTOMS_COLLECTION)
+    
+    if cursor is not None:
+        return FastJSONResponse(await fetch_keyset_page(
+            symptoms_collection, query, ["timestamp", "_id"], cursor, limit, SYMPTOM_PROJECTION
+        ), headers=etag_headers(etag))
+    
+    symptoms = await symptoms_collection.find(query, SYMPTOM_PROJECTION).skip(skip).limit(limit).to_list(length=None)
     
-    # Convert ObjectId to string for each symptom
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse(symptoms, headers=etag_headers(etag))
+
+@router.get("/{user_id}/stats", response_description="Symptom severity statistics for a user")
+async def get_symptom_stats(
+    request: Request,
+    user_id: str,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    bucket: str = "day"
+):
+    """
+    Get symptom counts and severity trends per day, week or month from the
+    daily rollups. The range is widened to whole days; it defaults to the
+    last 30 days.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    if bucket not in ("day", "week", "month"):
+        raise HTTPException(status_code=400, detail="bucket must be one of day, week, month")
+    
+    # Without an explicit end date the range moves with the clock, so only
+    # fixed ranges can be revalidated
+    etag = await user_etag(request, user_id) if end_date is not None else None
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    
+    start, end = parse_date_range(start_date, end_date)
+    stats = await symptom_stats(request.app.database, user_id, start, end, bucket)
+    
+    return FastJSONResponse({
+        "user_id": user_id,
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "bucket": bucket,
+        **stats
+    }, headers=etag_headers(etag) if etag else None)
+
+async def scan_search(symptoms_collection, user_id, q, skip, limit):
+    """
+    Search for collections without a text index (time-series ones cannot
+    have one): match any term case-insensitively and score matches with the
+    text index's weights, 3 for the name and 1 for the details. Only the
+    SEARCH_SCAN_LIMIT most recent matches are ranked, so older matches
+    drop out of long histories instead of the scan growing with them.
+    """
+    pattern = re.compile("|".join(re.escape(term) for term in q.split()), re.IGNORECASE)
+    regex = {"$regex": pattern.pattern, "$options": "i"}
+    symptoms = await symptoms_collection.find(
+        {"user_id": user_id, "$or": [{"name": regex}, {"details": regex}]}, SYMPTOM_PROJECTION
+    ).sort("timestamp", -1).limit(SEARCH_SCAN_LIMIT).to_list(length=None)
     for symptom in symptoms:
-        symptom["_id"] = str(symptom["_id"])
+        symptom["score"] = 3 * len(pattern.findall(symptom.get("name", ""))) + len(pattern.findall(symptom.get("details", "")))
+    symptoms.sort(key=lambda symptom: (symptom["score"], symptom["timestamp"]), reverse=True)
+    return symptoms[skip:skip + limit + 1]
+
+@router.get("/{user_id}/search", response_description="Search symptoms for a user")
+async def search_symptoms(
+    request: Request,
+    user_id: str,
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Full-text search over symptom names and details, best matches first.
+    Returns {"items", "next_skip"}; next_skip is null on the last page.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    etag = await user_etag(request, user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
+    projection = {**SYMPTOM_PROJECTION, "score": {"$meta": "textScore"}}
+    symptoms_collection = request.app.database.get_collection(SYMPTOMS_COLLECTION)
+    
+    # Fetch one extra document to know whether another page exists
+    if USE_TIMESERIES:
+        symptoms = await scan_search(symptoms_collection, user_id, q, skip, limit)
+    else:
+        symptoms = await symptoms_collection.find(
+            {"user_id": user_id, "$text": {"$search": q}},
+            projection
+        ).sort([("score", {"$meta": "textScore"}), ("timestamp", -1)]).skip(skip).limit(limit + 1).to_list(length=None)
+    
+    next_skip = skip + limit if len(symptoms) > limit else None
     
-    return symptoms
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse({"items": symptoms[:limit], "next_skip": next_skip}, headers=etag_headers(etag))
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+
+from routes.medications import MEDICATION_PROJECTION
+from routes.symptoms import SYMPTOM_PROJECTION
+from delta_sync import SYNC_COLLECTIONS, TOMBSTONES_COLLECTION, fetch_changes, token_expired
+from utils import FastJSONResponse, as_stored_datetime, decode_cursor, encode_cursor, validate_object_id
+
+router = APIRouter()
+
+# Fields returned for changed documents
+SYNC_PROJECTIONS = {
+    "symptoms": {**SYMPTOM_PROJECTION, "updated_at": 1},
+    "medications": MEDICATION_PROJECTION,
+}
+
+@router.get("/{user_id}", response_description="Changes to a user's data since a sync token")
+async def sync_user(
+    request: Request,
+    user_id: str,
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000)
+):
+    """
+    Get the symptoms and medications created, updated or deleted since the
+    token of a previous sync; without since, everything is returned. Keep
+    calling with next_token while has_more is set. Changes near the end of
+    a sync can be sent again, so apply them by _id. A token older than the
+    tombstone retention gets 410 and the client should re-list everything.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    
+    position = None
+    if since:
+        try:
+            updated_at, last_id = decode_cursor(since, 2)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not isinstance(updated_at, datetime) or not isinstance(last_id, ObjectId):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        position = (as_stored_datetime(updated_at), last_id)
+        if token_expired(position):
+            raise HTTPException(status_code=410, detail="Sync token expired, fetch the full lists again")
+    
+    changes, has_more, next_position = await fetch_changes(
+        request.app.database, user_id, position, limit, SYNC_PROJECTIONS
+    )
+    
+    response = {name: [] for name in SYNC_COLLECTIONS}
+    response["deleted"] = {name: [] for name in SYNC_COLLECTIONS}
+    for collection_name, document in changes:
+        if collection_name == TOMBSTONES_COLLECTION:
+            response["deleted"].setdefault(document["collection"], []).append(document["item_id"])
+        else:
+            response[collection_name].append(document)
+    
+    response["next_token"] = encode_cursor(list(next_position))
+    response["has_more"] = has_more
+    
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse(response)
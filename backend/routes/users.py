@@ -1,40 +1,50 @@
 from fastapi import APIRouter, HTTPException, Body, Request
+from fastapi.responses import StreamingResponse
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
+from typing import Optional
 
+from export import EXPORT_FORMATS, export_records, gzip_chunks
 from models import UserModel, UserCreate
-from utils import validate_object_id
+from utils import FastJSONResponse, as_stored_datetime, fetch_keyset_page, validate_object_id
+from versions import etag_headers, etag_matches, not_modified, user_etag
 
 router = APIRouter()
 
+# Fields returned by the read endpoints
+USER_PROJECTION = {"username": 1, "email": 1, "unique_id_from_auth": 1, "created_at": 1}
+
 @router.post("/", response_description="Create new user")
-def create_user(request: Request, user: UserCreate = Body(...)):
+async def create_user(request: Request, user: UserCreate = Body(...)):
     """Create a new user"""
     user_data = user.dict()
-    user_data["created_at"] = datetime.now()
-    
-    # Check if user with this email already exists
-    if request.app.database.get_collection("users").find_one({"email": user_data["email"]}):
-        raise HTTPException(status_code=400, detail="Email already registered")
+    user_data["created_at"] = as_stored_datetime(datetime.now())
     
-    # Insert user into database
+    # Insert user into database; the unique email index rejects duplicates
     users_collection = request.app.database.get_collection("users")
-    new_user = users_collection.insert_one(user_data)
-    created_user = users_collection.find_one({"_id": new_user.inserted_id})
+    try:
+        await users_collection.insert_one(user_data)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     # Convert ObjectId to string for the response
-    created_user["_id"] = str(created_user["_id"])
+    user_data["_id"] = str(user_data["_id"])
     
-    return created_user
+    return user_data
 
 @router.get("/{user_id}", response_description="Get a user by ID")
-def get_user(request: Request, user_id: str):
-    """Get a user by their ID"""
+async def get_user(request: Request, user_id: str):
+    """Get a user by their ID; answers If-None-Match with 304 while the user is unchanged"""
     if not validate_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid user ID")
     
+    etag = await user_etag(request, user_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     users_collection = request.app.database.get_collection("users")
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
     
     if not user:
         raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
@@ -42,16 +52,51 @@ def get_user(request: Request, user_id: str):
     # Convert ObjectId to string
     user["_id"] = str(user["_id"])
     
-    return user
+    return FastJSONResponse(user, headers=etag_headers(etag))
 
 @router.get("/", response_description="List all users")
-def list_users(request: Request, skip: int = 0, limit: int = 100):
-    """Get a list of all users"""
+async def list_users(request: Request, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+    """
+    Get a list of all users.
+    Passing cursor (empty for the first page) switches to keyset pagination
+    ordered by _id and returns {"items", "next_cursor"}.
+    """
+    users_collection = request.app.database.get_collection("users")
+    
+    if cursor is not None:
+        return FastJSONResponse(await fetch_keyset_page(users_collection, {}, ["_id"], cursor, limit, USER_PROJECTION))
+    
+    users = await users_collection.find({}, USER_PROJECTION).skip(skip).limit(limit).to_list(length=None)
+    
+    # ObjectIds are converted to strings while serializing
+    return FastJSONResponse(users)
+
+@router.get("/{user_id}/export", response_description="Export a user's full history")
+async def export_user_data(request: Request, user_id: str, format: str = "ndjson", gzip: bool = False):
+    """
+    Stream every symptom and medication of a user as NDJSON or CSV, straight
+    from batched cursors, so memory stays flat however long the history is.
+    gzip=true compresses the stream into a .gz download.
+    """
+    if not validate_object_id(user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    
     users_collection = request.app.database.get_collection("users")
-    users = list(users_collection.find().skip(skip).limit(limit))
+    if not await users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail=f"User with ID {user_id} not found")
     
-    # Convert ObjectId to string for each user
-    for user in users:
-        user["_id"] = str(user["_id"])
+    media_type, extension = EXPORT_FORMATS[format]
+    chunks = export_records(request.app.database, user_id, format)
+    filename = f"export-{user_id}.{extension}"
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
     
-    return users
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
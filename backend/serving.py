@@ -0,0 +1,60 @@
+"""
+Serve the API from one or more uvicorn worker processes.
+
+    python main.py                           # WEB_CONCURRENCY workers, 1 by default
+    python serving.py --workers auto         # one worker per core
+    WEB_CONCURRENCY=4 uvicorn main:app       # uvicorn reads the same variable
+
+Each worker is a separate process that imports main and creates its own
+Mongo and LLM clients in the startup hook, so no connection is shared
+across processes. Connection limits below are totals for the whole server,
+divided evenly between the workers. With several workers report jobs and
+admission rate limits are kept in Mongo (REPORT_JOB_BACKEND,
+ADMISSION_BACKEND), so every worker sees the same jobs and limits.
+"""
+import argparse
+import os
+
+# Worker processes; "auto" starts one per core
+WEB_CONCURRENCY = os.getenv("WEB_CONCURRENCY", "1")
+
+# Seconds a stopping worker waits for open requests, e.g. streamed reports,
+# before closing their connections
+SHUTDOWN_GRACE = float(os.getenv("SHUTDOWN_GRACE", 30))
+
+
+def worker_count(value=WEB_CONCURRENCY):
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+WORKERS = worker_count()
+
+
+def per_worker(total, minimum=1):
+    """One worker's share of a limit that applies to the whole server"""
+    return max(minimum, total // WORKERS)
+
+
+def run(app="main:app", workers=WORKERS, host="0.0.0.0", port=None):
+    """Serve app, an application or its import string; several workers need the import string"""
+    import uvicorn
+
+    port = port or int(os.getenv("PORT", 8000))  # Use Render's assigned port if available
+    if workers == 1:
+        uvicorn.run(app, host=host, port=port, timeout_graceful_shutdown=SHUTDOWN_GRACE)
+        return
+    # Workers are spawned, not forked, and size their pools from this
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run("main:app", host=host, port=port, workers=workers, timeout_graceful_shutdown=SHUTDOWN_GRACE)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the API")
+    parser.add_argument("--workers", default=WEB_CONCURRENCY, help='worker processes, or "auto" for one per core')
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int)
+    args = parser.parse_args()
+
+    run(workers=worker_count(args.workers), host=args.host, port=args.port)
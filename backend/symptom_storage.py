@@ -0,0 +1,43 @@
+from pymongo.errors import CollectionInvalid
+import os
+
+# "collection" keeps symptoms in the plain symptoms collection; "timeseries"
+# reads and writes a time-series collection keyed by user_id. Run
+# migrate_symptoms.py to copy existing symptoms before switching.
+SYMPTOMS_STORAGE = os.getenv("SYMPTOMS_STORAGE", "collection")
+SYMPTOMS_TIMESERIES_GRANULARITY = os.getenv("SYMPTOMS_TIMESERIES_GRANULARITY", "hours")
+
+PLAIN_SYMPTOMS_COLLECTION = "symptoms"
+TIMESERIES_SYMPTOMS_COLLECTION = "symptoms_timeseries"
+
+USE_TIMESERIES = SYMPTOMS_STORAGE == "timeseries"
+
+# The collection every symptom read and write goes to
+SYMPTOMS_COLLECTION = TIMESERIES_SYMPTOMS_COLLECTION if USE_TIMESERIES else PLAIN_SYMPTOMS_COLLECTION
+
+
+async def create_timeseries_collection(database, name=TIMESERIES_SYMPTOMS_COLLECTION):
+    """Create the time-series symptoms collection unless it exists; returns whether it was created"""
+    if await database.list_collection_names(filter={"name": name}):
+        return False
+    try:
+        await database.create_collection(name, timeseries={
+            "timeField": "timestamp",
+            "metaField": "user_id",
+            "granularity": SYMPTOMS_TIMESERIES_GRANULARITY
+        })
+    except CollectionInvalid:
+        # Another worker created it first
+        return False
+    return True
+
+
+async def ensure_symptom_storage(database):
+    """
+    Create the time-series collection before anything is written to it;
+    a first insert would otherwise create a plain collection of that name
+    """
+    if SYMPTOMS_STORAGE == "timeseries":
+        await create_timeseries_collection(database)
+    elif SYMPTOMS_STORAGE != "collection":
+        raise ValueError(f"Unknown SYMPTOMS_STORAGE: {SYMPTOMS_STORAGE}")
@@ -1,5 +1,33 @@
-from datetime import datetime, timedelta
-from bson import ObjectId
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId, json_util
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from pymongo import ASCENDING
+import base64
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_default(value):
+    """Encode values JSON has no type for: ObjectId as str, datetime as ISO 8601"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson when it is installed. Routes can return
+    raw Mongo documents in it directly, skipping jsonable_encoder; ObjectIds
+    are converted while serializing.
+    """
+    
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=json_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
 def parse_date_range(start_date=None, end_date=None):
     """Parse date range or provide defaults"""
@@ -13,8 +41,71 @@ def parse_date_range(start_date=None, end_date=None):
         
     return start, end
 
+def as_stored_datetime(value: datetime):
+    """Return a datetime as MongoDB stores and returns it (naive UTC, millisecond precision)"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+def stored_now():
+    """The current time as the routes stamp documents: UTC+4 (GST), as stored"""
+    return as_stored_datetime(datetime.now(timezone.utc) + timedelta(hours=4))
+
 def validate_object_id(id_str: str):
     """Validate if a string is a valid ObjectId"""
     if not ObjectId.is_valid(id_str):
         return False
     return True
+
+# Largest page a cursor request may ask for
+MAX_PAGE_SIZE = 1000
+
+def encode_cursor(values):
+    """Encode the sort key of the last returned document as an opaque cursor"""
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, size: int):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def keyset_filter(sort_fields, values):
+    """Filter matching documents that sort strictly after the given key (ascending)"""
+    clauses = []
+    for i, field in enumerate(sort_fields):
+        clause = {sort_fields[j]: values[j] for j in range(i)}
+        clause[field] = {"$gt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+async def fetch_keyset_page(collection, query, sort_fields, cursor, limit, projection=None):
+    """
+    Fetch one page sorted ascending on sort_fields, starting after cursor.
+    An empty cursor starts from the first page. Documents are returned as
+    stored, for a FastJSONResponse to serialize.
+    """
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if cursor:
+        try:
+            values = decode_cursor(cursor, len(sort_fields))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = {"$and": [query, keyset_filter(sort_fields, values)]}
+    
+    # Fetch one extra document to know whether another page exists
+    documents = await collection.find(query, projection).sort(
+        [(field, ASCENDING) for field in sort_fields]
+    ).limit(limit + 1).to_list(length=None)
+    
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor([documents[-1][field] for field in sort_fields])
+    
+    return {"items": documents, "next_cursor": next_cursor}
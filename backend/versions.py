@@ -0,0 +1,60 @@
+from fastapi.responses import Response
+from bson import ObjectId
+import hashlib
+
+USER_VERSIONS_COLLECTION = "user_versions"
+
+# Clients may reuse a response only after revalidating it with If-None-Match
+CACHE_CONTROL = "private, no-cache"
+
+
+async def bump_user_version(database, user_id):
+    """Record a write to a user's data; call it after the write has succeeded"""
+    await database.get_collection(USER_VERSIONS_COLLECTION).update_one(
+        {"_id": user_id},
+        {"$inc": {"version": 1}, "$setOnInsert": {"epoch": str(ObjectId())}},
+        upsert=True
+    )
+
+
+async def get_user_version(database, user_id):
+    """
+    The user's (epoch, version); ("", 0) before their first recorded write.
+    The epoch is set when the counter document is created, so a counter
+    recreated after being deleted does not repeat ETags of earlier versions.
+    """
+    document = await database.get_collection(USER_VERSIONS_COLLECTION).find_one({"_id": user_id})
+    if document is None:
+        return "", 0
+    return document["epoch"], document["version"]
+
+
+def make_etag(request, epoch, version):
+    """Strong ETag for this path and query string at the given user version"""
+    query = "&".join(sorted(f"{key}={value}" for key, value in request.query_params.multi_items()))
+    payload = f"{request.url.path}?{query}|{epoch}|{version}"
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(request, etag):
+    """Whether If-None-Match names etag; the comparison is weak, as RFC 9110 requires for it"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+async def user_etag(request, user_id):
+    """ETag of a read endpoint for one user's data, from their version counter"""
+    epoch, version = await get_user_version(request.app.database, user_id)
+    return make_etag(request, epoch, version)
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def etag_headers(etag):
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}